@@ -1,17 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from core.config import settings
-from routers import chat, control
+from core.state import system_state
+from core.metrics import metrics_registry
+from core.executor import loop_monitor, stage_executor
+from core.reload import reload_watcher
+from core.snapshot import snapshot_store
+from core.logs import configure_logging, logging_pipeline, RequestIdMiddleware
+from core.drain import drain_controller
+from services.health import health_prober
+from routers import chat, control, debug
+import asyncio
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (JSON through a background writer thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Global state variables for system control
-ACCEPT_REQUESTS = True
-ENERGY_MODE = settings.energy_mode
-
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
@@ -26,48 +32,104 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request IDs for log correlation (outermost, so every log line carries one)
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(control.router, prefix="/api", tags=["control"])
+app.include_router(debug.router, prefix="/api", tags=["debug"])
 
 @app.get("/")
 async def root():
     """Root endpoint with system info"""
+    _, accept_requests, energy_mode = system_state.read()
     return {
         "name": settings.app_name,
         "version": settings.app_version,
-        "status": "operational" if ACCEPT_REQUESTS else "shutdown",
-        "mode": ENERGY_MODE,
+        "status": "draining" if not drain_controller.accepting else "operational" if accept_requests else "shutdown",
+        "mode": energy_mode,
         "message": "Klein + Ophir: Two AIs. One helps. One protects."
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus metrics aggregated across all workers on this node"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.on_event("startup")
 async def startup_event():
     """Application startup tasks"""
     logger.info(f"Starting {settings.app_name} v{settings.app_version}")
-    logger.info(f"Energy mode: {ENERGY_MODE}")
+    logger.info(f"Energy mode: {system_state.energy_mode}")
     logger.info(f"CORS origins: {settings.cors_origins}")
 
+    # Publish this worker's metrics for cross-worker aggregation
+    metrics_registry.start_flusher()
+
+    # Watch for blocking calls on the event loop
+    loop_monitor.start()
+
+    # Hot-reload Ophir rules and the local knowledge base
+    reload_watcher.start()
+
+    # Warm restart: restore caches and session memory before taking traffic
+    snapshot_store.load()
+    snapshot_store.start()
+
+    # Warm up and start health probes once uvicorn has bound the socket
+    asyncio.get_running_loop().create_task(_after_startup())
+
     # Log system startup
     from services.audit import audit_service
     audit_service.log_event("SYSTEM_STARTUP", {
         "version": settings.app_version,
-        "energy_mode": ENERGY_MODE
+        "energy_mode": system_state.energy_mode
     })
 
+async def _after_startup():
+    """Deferred so heavy client imports never delay the socket bind"""
+    await asyncio.sleep(settings.warmup_delay_s)
+
+    if settings.warmup_enabled:
+        from services.warmup import warm_up
+        try:
+            await stage_executor.run("warmup", warm_up)
+        except Exception as e:
+            logger.warning(f"Warm-up failed: {e}")
+
+    # Probe dependencies in the background; /api/health serves the cache
+    health_prober.start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown tasks"""
     logger.info("Shutting down Klein AI Dual Framework")
 
-    # Log system shutdown
+    # Refuse new work and let running generations and audit writes finish
+    drain_controller.draining = True
+    outcome = await drain_controller.drain(settings.drain_timeout_s, reason="application_termination")
+    stage_executor.shutdown(wait=outcome["drained"])
+
+    # Leave a fresh snapshot for the next start
+    snapshot_store.write()
+
+    # Log system shutdown with the drain outcome
     from services.audit import audit_service
     audit_service.log_event("SYSTEM_SHUTDOWN", {
-        "reason": "application_termination"
+        "reason": "application_termination",
+        "drain": outcome
     })
 
+    # Flush queued log records
+    logging_pipeline.stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=3001)
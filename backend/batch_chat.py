@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Offline batch chat runner for Klein AI Dual Framework
+Runs a JSONL file of ChatRequest records through the same Klein + Ophir
+pipeline as /api/chat, without HTTP, spread across a process pool.
+
+Usage:
+    python batch_chat.py queries.jsonl results.jsonl --workers 8
+    python batch_chat.py queries.jsonl results.jsonl --resume
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from typing import Iterator, Tuple
+
+def _init_worker(log_level: str):
+    """Quiet per-worker logging; services are imported once per process"""
+    logging.basicConfig(level=getattr(logging, log_level))
+    import services.pipeline  # noqa: F401
+
+def _run_record(item: Tuple[int, str, str]) -> str:
+    """Run one JSONL record through the chat pipeline and return the result line"""
+    from pydantic import ValidationError
+    from models.schemas import ChatRequest
+    from services.pipeline import chat_pipeline
+
+    index, line, mode = item
+    try:
+        request = ChatRequest.model_validate_json(line)
+    except ValidationError as e:
+        return json.dumps({"index": index, "error": f"invalid ChatRequest: {e.errors()[0]['msg']}"})
+
+    response = chat_pipeline.run(request, mode=mode)
+    return json.dumps({"index": index, "message": request.message, **response.model_dump()})
+
+def _read_records(path: str, skip: int, mode: str) -> Iterator[Tuple[int, str, str]]:
+    """Yield (index, line, mode) for non-empty input lines, skipping completed ones"""
+    index = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if index >= skip:
+                yield index, line, mode
+            index += 1
+
+def _load_checkpoint(path: str, input_path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return {"completed": 0, "output_bytes": 0}
+
+    if checkpoint.get("input") != input_path:
+        raise SystemExit(f"Checkpoint {path} belongs to {checkpoint.get('input')}, not {input_path}")
+    return checkpoint
+
+def _save_checkpoint(path: str, input_path: str, completed: int, output_bytes: int):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"input": input_path, "completed": completed, "output_bytes": output_bytes}, f)
+    os.replace(tmp_path, path)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of chat requests through Klein + Ophir")
+    parser.add_argument("input", help="JSONL file of ChatRequest records")
+    parser.add_argument("output", help="JSONL file for ChatResponse results (input order)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Process pool size")
+    parser.add_argument("--mode", default=None, help="Energy mode (default: ENERGY_MODE setting)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Records sent to a worker at a time")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Records between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint")
+    parser.add_argument("--log-level", default="WARNING", help="Worker log level")
+    args = parser.parse_args()
+
+    from core.config import settings
+
+    mode = args.mode or settings.energy_mode
+    input_path = os.path.abspath(args.input)
+    checkpoint_path = args.output + ".ckpt"
+
+    completed, output_bytes = 0, 0
+    if args.resume and os.path.exists(args.output):
+        checkpoint = _load_checkpoint(checkpoint_path, input_path)
+        completed, output_bytes = checkpoint["completed"], checkpoint["output_bytes"]
+        print(f"▶️  Resuming after {completed} records", file=sys.stderr)
+
+    # Drop anything written after the last checkpoint
+    output = open(args.output, "r+b" if completed else "wb")
+    output.truncate(output_bytes)
+    output.seek(output_bytes)
+
+    statuses = Counter()
+    started = time.perf_counter()
+    processed = 0
+
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(args.log_level.upper(),)) as pool:
+        try:
+            records = _read_records(input_path, completed, mode)
+            for result in pool.imap(_run_record, records, chunksize=args.chunk_size):
+                output.write(result.encode("utf-8") + b"\n")
+                statuses[json.loads(result).get("status", "ERROR")] += 1
+                processed += 1
+
+                if processed % args.checkpoint_every == 0:
+                    output.flush()
+                    _save_checkpoint(checkpoint_path, input_path, completed + processed, output.tell())
+                    rate = processed / (time.perf_counter() - started)
+                    print(f"   {completed + processed} records ({rate:.1f}/s)", file=sys.stderr)
+        finally:
+            output.flush()
+            _save_checkpoint(checkpoint_path, input_path, completed + processed, output.tell())
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"✅ {processed} records in {elapsed:.2f}s ({rate:.1f} records/s, {args.workers} workers)", file=sys.stderr)
+    print(f"   Status breakdown: {dict(statuses)}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Seeded synthetic data for the benchmarks
+Every generator takes a random.Random so runs with the same seed see
+identical inputs.
+"""
+
+import json
+import random
+import string
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+# Plain vocabulary for messages and documents; never contains generated terms
+WORDS = (
+    "weather storm hurricane season port prince haiti emergency response team "
+    "navigation training protocol water supply shelter medical clinic community "
+    "guidance support language french creole english route supply road bridge "
+    "report update plan safety family school power grid energy radio signal "
+    "coast harbor vessel crew forecast rain wind flood evacuation center help"
+).split()
+
+SOURCES = ("Haiti Emergency Management", "Naval Training Manual (Unclassified)",
+           "International Response Guidelines", "Community Health Network")
+
+def make_terms(rng: random.Random, count: int) -> List[str]:
+    """Distinct keyword terms that never occur in WORDS-based text"""
+    terms = set()
+    while len(terms) < count:
+        terms.add("zx" + "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))))
+    return sorted(terms)
+
+def make_text(rng: random.Random, length: int) -> str:
+    """Roughly `length` characters of WORDS"""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+def make_docs(rng: random.Random, count: int, content_chars: int = 240) -> List[Dict[str, Any]]:
+    """Retrieval documents shaped like data/local_docs.json entries"""
+    return [
+        {
+            "title": make_text(rng, 40).title(),
+            "content": make_text(rng, content_chars),
+            "source": rng.choice(SOURCES),
+            "score": round(rng.uniform(0.5, 10.0), 3)
+        }
+        for _ in range(count)
+    ]
+
+def make_audit_log(rng: random.Random, path: str, events: int):
+    """Write an audit log of `events` records in AuditService's format"""
+    event_types = ("RESTRICTED_QUERY", "MODE_CHANGE", "SHUTDOWN_REQUEST", "SECURITY_FLAG")
+    timestamp = datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat()
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(events):
+            f.write(json.dumps({
+                "timestamp": timestamp,
+                "event_id": f"{rng.getrandbits(128):032x}",
+                "event_type": rng.choice(event_types),
+                "query": make_text(rng, 60),
+                "sequence": i
+            }) + "\n")
+
+def make_chat_payload(rng: random.Random, length: int) -> Dict[str, Any]:
+    return {"message": make_text(rng, length)}
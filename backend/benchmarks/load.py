@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+End-to-end load harness for /api/chat
+Starts the Elasticsearch and Vertex AI stand-ins plus a uvicorn server wired
+to them, then drives /api/chat closed-loop (fixed concurrency) or open-loop
+(Poisson arrivals at a fixed rate) and reports throughput, latency
+percentiles and an error breakdown. Use --target to load an already running
+server instead (stand-ins and server are then not started).
+
+Usage (from backend/):
+    python -m benchmarks.load --workers 2 --concurrency 32 --duration 30
+    python -m benchmarks.load --rate 50 --duration 60 --vertex-error-rate 0.05 --json load.json
+    python -m benchmarks.load --target http://127.0.0.1:8000 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from benchmarks import data
+from benchmarks.standins import add_arguments, start_standins
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = (
+    "What's the weather like in Port-au-Prince?",
+    "How do I prepare a family for hurricane season?",
+    "Which languages should responders use in Haiti?",
+    "I'm feeling overwhelmed by all of this",
+    "Explain basic navigation protocols for Caribbean waters",
+)
+
+class Results:
+    """Latencies and outcomes of one load run"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def record(self, latency: float, outcome: str, error: Optional[str] = None):
+        self.outcomes[outcome] += 1
+        if error:
+            self.errors[error] += 1
+        else:
+            self.latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = self.finished - self.started
+        latencies = sorted(self.latencies)
+        total = sum(self.outcomes.values())
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+        return {
+            "requests": total,
+            "duration_s": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": percentile(1.0)
+            },
+            "outcomes": dict(self.outcomes),
+            "errors": dict(self.errors)
+        }
+
+def _message(rng: random.Random) -> str:
+    if rng.random() < 0.8:
+        return rng.choice(QUERIES)
+    return data.make_text(rng, rng.randint(20, 200))
+
+async def _send(client, url: str, message: str, results: Results, scheduled: float):
+    """One request; latency counts from the scheduled time to avoid coordinated omission"""
+    try:
+        response = await client.post(url, json={"message": message})
+        latency = time.perf_counter() - scheduled
+        if response.status_code == 200:
+            results.record(latency, response.json().get("status", "UNKNOWN"))
+        else:
+            results.record(latency, "HTTP_ERROR", f"http_{response.status_code}")
+    except Exception as e:
+        results.record(time.perf_counter() - scheduled, "CLIENT_ERROR", type(e).__name__)
+
+async def closed_loop(client, url: str, concurrency: int, duration: float, rng: random.Random) -> Results:
+    results = Results()
+    deadline = results.started + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await _send(client, url, _message(rng), results, time.perf_counter())
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    results.finished = time.perf_counter()
+    return results
+
+async def open_loop(client, url: str, rate: float, duration: float, max_outstanding: int,
+                    rng: random.Random) -> Results:
+    results = Results()
+    tasks = set()
+    next_arrival = results.started
+    deadline = results.started + duration
+
+    while next_arrival < deadline:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_outstanding:
+            # The server has fallen this far behind; count it instead of piling on
+            results.record(0.0, "DROPPED", "client_backlog")
+        else:
+            task = asyncio.ensure_future(_send(client, url, _message(rng), results, next_arrival))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        next_arrival += rng.expovariate(rate)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    results.finished = time.perf_counter()
+    return results
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args: argparse.Namespace, elastic_url: str, vertex_url: str, workdir: str):
+    """uvicorn wired to the stand-ins; returns (process, base url, log path)"""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        ELASTIC_ENDPOINT=elastic_url,
+        ELASTIC_API_KEY="standin",
+        ELASTIC_CLOUD_ID="",
+        GCP_PROJECT="standin",
+        VERTEX_API_BASE=vertex_url,
+        VERTEX_ACCESS_TOKEN="standin",
+        VERTEX_GENERATE="true",
+        VERTEX_MODEL="gemini-1.5-flash",
+        # Every simulated user shares one IP; measure capacity, not the limiter
+        RATE_LIMIT_ENABLED=os.environ.get("RATE_LIMIT_ENABLED", "false"),
+        RUNTIME_DIR=os.path.join(workdir, "runtime"),
+        PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    )
+    if args.stub_vertex:
+        env["GCP_PROJECT"] = ""
+
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", BACKEND_DIR,
+             "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    return process, f"http://127.0.0.1:{port}", log_path
+
+async def wait_ready(client, base_url: str, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready in {timeout}s")
+
+async def run(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    import httpx
+
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_outstanding))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client, base_url)
+        url = f"{base_url}/api/chat"
+        if args.warmup:
+            await closed_loop(client, url, args.concurrency, args.warmup, rng)
+        if args.rate:
+            results = await open_loop(client, url, args.rate, args.duration, args.max_outstanding, rng)
+        else:
+            results = await closed_loop(client, url, args.concurrency, args.duration, rng)
+    return results.summary()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test /api/chat against Elasticsearch and Vertex AI stand-ins")
+    parser.add_argument("--target", help="Base URL of a running server (skips stand-ins and server)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned server")
+    parser.add_argument("--stub-vertex", action="store_true", help="Leave Vertex unconfigured (stub responses)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: concurrent users")
+    parser.add_argument("--rate", type=float, default=0.0, help="Open loop: mean arrivals per second")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="Open loop: in-flight cap before dropping")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client request timeout")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this JSON file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    elastic = vertex = server = None
+    workdir = tempfile.mkdtemp(prefix="klein-load-")
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            elastic, vertex = start_standins(args)
+            server, base_url, log_path = start_server(args, elastic.url, vertex.url, workdir)
+            print(f"Server log: {log_path}")
+
+        report = asyncio.run(run(args, base_url))
+        report["config"] = {
+            "mode": "open" if args.rate else "closed",
+            "rate": args.rate or None,
+            "concurrency": None if args.rate else args.concurrency,
+            "workers": None if args.target else args.workers,
+            "elastic_latency": args.elastic_latency,
+            "vertex_latency": args.vertex_latency,
+            "elastic_error_rate": args.elastic_error_rate,
+            "vertex_error_rate": args.vertex_error_rate
+        }
+        if elastic and vertex:
+            report["standins"] = {"elastic": elastic.behavior.stats(), "vertex": vertex.behavior.stats()}
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+        for standin in (elastic, vertex):
+            if standin:
+                standin.stop()
+
+    latency = report["latency_ms"]
+    print(f"{report['requests']} requests in {report['duration_s']}s = {report['throughput_rps']} req/s")
+    print(f"latency p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms max={latency['max']}ms")
+    print(f"outcomes: {report['outcomes']}")
+    if report["errors"]:
+        print(f"errors:   {report['errors']}")
+    if "standins" in report:
+        print(f"stand-ins: {report['standins']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
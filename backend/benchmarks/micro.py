@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure-Python hot paths
+Covers Ophir evaluation, local retrieval, query normalization, context
+packing, session memory, audit logging and request/response validation over
+seeded synthetic inputs of growing size.
+
+Results are written as JSON; pass a previous result file as --baseline to
+compare and exit non-zero when a case regressed past --threshold.
+
+Usage (from backend/):
+    python -m benchmarks.micro --json bench.json
+    python -m benchmarks.micro --baseline bench.json --threshold 0.25
+    python -m benchmarks.micro --filter ophir --quick
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Tuple
+
+from benchmarks import data
+
+Setup = Callable[[random.Random], ContextManager[Callable[[], Any]]]
+
+@contextlib.contextmanager
+def _ophir(terms: int, chars: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.ophir import ophir_service, OphirRules
+    from services.query import QueryContext
+
+    saved = ophir_service.rules
+    rules = {**_rules_dict(saved.for_lang("en")), "restricted_terms": data.make_terms(rng, terms)}
+    ophir_service.rules_file.replace(OphirRules({"languages": {"en": rules}}))
+    query = QueryContext(data.make_text(rng, chars), "en")
+    response = "Klein: " + data.make_text(rng, chars)
+    try:
+        # Generated text never contains a restricted term, so nothing is audited
+        yield partial(ophir_service.evaluate_response, query, response)
+    finally:
+        ophir_service.rules_file.replace(saved)
+
+def _rules_dict(rules) -> Dict[str, Any]:
+    return {
+        "restricted_terms": rules.restricted_terms,
+        "empathy_triggers": rules.empathy_triggers,
+        "harmful_patterns": rules.harmful_patterns,
+        "restricted_response": rules.restricted_response
+    }
+
+@contextlib.contextmanager
+def _local_search(docs: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.retrieval import retrieval_service, LocalIndex
+    from services.query import QueryContext
+
+    saved = retrieval_service.local_docs.current
+    retrieval_service.local_docs.replace(LocalIndex({"documents": data.make_docs(rng, docs)}))
+    try:
+        yield partial(retrieval_service._local_search, QueryContext(data.make_text(rng, 48), "en"), 3)
+    finally:
+        retrieval_service.local_docs.replace(saved)
+
+@contextlib.contextmanager
+def _detect_lang(chars: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.language import languages
+
+    yield partial(languages.detect, data.make_text(rng, chars))
+
+@contextlib.contextmanager
+def _query_context(chars: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.query import QueryContext
+
+    yield partial(QueryContext, data.make_text(rng, chars))
+
+@contextlib.contextmanager
+def _format_context(docs: int, mode: str, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.klein import klein_service
+    from services.retrieval import Passage
+
+    yield partial(klein_service._format_context, [Passage(**doc) for doc in data.make_docs(rng, docs)], mode)
+
+@contextlib.contextmanager
+def _memory(operation: str, sessions: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.memory import SessionMemory
+
+    memory = SessionMemory(enabled=True, max_turns=8, session_bytes=4096, budget_bytes=1 << 30,
+                           ttl_s=3600, summary_budgets={"normal": 600})
+    for n in range(sessions):
+        for _ in range(8):
+            memory.record(f"session-{n}", data.make_text(rng, 60), data.make_text(rng, 200))
+    if operation == "record":
+        yield partial(memory.record, f"session-{sessions // 2}", data.make_text(rng, 60), data.make_text(rng, 200))
+    else:
+        yield partial(memory.summary, f"session-{sessions // 2}")
+
+@contextlib.contextmanager
+def _audit(method: str, events: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from services.audit import AuditService
+
+    with tempfile.TemporaryDirectory(prefix="klein-bench-") as workdir:
+        audit = AuditService(log_file=os.path.join(workdir, "audit-log.jsonl"))
+        data.make_audit_log(rng, audit.log_file, events)
+        if method == "log_event":
+            yield partial(audit.log_event, "BENCHMARK", {"query": data.make_text(rng, 60)})
+        else:
+            yield partial(audit.get_recent_events, 10)
+
+@contextlib.contextmanager
+def _schema(operation: str, chars: int, rng: random.Random) -> Iterator[Callable[[], Any]]:
+    from models.schemas import ChatRequest, ChatResponse
+
+    payload = data.make_chat_payload(rng, chars)
+    if operation == "request.validate":
+        yield partial(ChatRequest.model_validate, payload)
+    elif operation == "request.validate_json":
+        yield partial(ChatRequest.model_validate_json, json.dumps(payload))
+    else:
+        response = ChatResponse(answer=payload["message"], status="SAFE")
+        yield response.model_dump_json
+
+def cases() -> List[Tuple[str, Setup]]:
+    registered: List[Tuple[str, Setup]] = []
+    for terms in (10, 100, 1000):
+        for chars in (64, 1024, 16384):
+            registered.append((f"ophir.evaluate_response[terms={terms},chars={chars}]", partial(_ophir, terms, chars)))
+    for docs in (3, 100, 1000, 10000):
+        registered.append((f"retrieval.local_search[docs={docs}]", partial(_local_search, docs)))
+    for chars in (64, 4096):
+        registered.append((f"language.detect[chars={chars}]", partial(_detect_lang, chars)))
+        registered.append((f"query.build[chars={chars}]", partial(_query_context, chars)))
+    for docs in (3, 50):
+        for mode in ("normal", "peak"):
+            registered.append((f"klein.format_context[docs={docs},mode={mode}]", partial(_format_context, docs, mode)))
+    for operation in ("record", "summary"):
+        for sessions in (10, 10000):
+            registered.append((f"memory.{operation}[sessions={sessions}]", partial(_memory, operation, sessions)))
+    for events in (100, 10000):
+        registered.append((f"audit.log_event[events={events}]", partial(_audit, "log_event", events)))
+        registered.append((f"audit.get_recent_events[events={events}]", partial(_audit, "get_recent_events", events)))
+    for operation in ("request.validate", "request.validate_json", "response.dump_json"):
+        for chars in (64, 4096):
+            registered.append((f"schemas.{operation}[chars={chars}]", partial(_schema, operation, chars)))
+    return registered
+
+def measure(fn: Callable[[], Any], min_time: float, repeats: int) -> Dict[str, Any]:
+    """Per-call timings: calibrate a loop count, then time `repeats` loops"""
+    def timed(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - started
+
+    number = 1
+    while timed(number) < min_time and number < 1_000_000:
+        number *= 2
+
+    per_call = sorted(timed(number) / number for _ in range(repeats))
+    return {
+        "min_us": round(per_call[0] * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "number": number,
+        "repeats": repeats
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, metric: str) -> List[str]:
+    """Names of cases slower than baseline by more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        ratio = result[metric] / previous[metric] if previous[metric] else 1.0
+        result["baseline_ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the pure-Python hot paths")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the synthetic data")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timed loop")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed loops per case")
+    parser.add_argument("--quick", action="store_true", help="Shorter loops (--min-time 0.02 --repeats 3)")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--metric", choices=["min_us", "median_us"], default="min_us", help="Value compared with the baseline")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.min_time, args.repeats = 0.02, 3
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results: Dict[str, Any] = {}
+    for name, setup in cases():
+        if args.filter not in name:
+            continue
+        with setup(random.Random(f"{args.seed}:{name}")) as fn:
+            results[name] = measure(fn, args.min_time, args.repeats)
+
+    regressions = compare(results, baseline, args.threshold, args.metric)
+
+    for name, result in results.items():
+        line = f"{name:58s} {result['min_us']:>12.3f}us min {result['median_us']:>12.3f}us median"
+        if "baseline_ratio" in result:
+            line += f"  x{result['baseline_ratio']:.2f}" + ("  REGRESSION" if name in regressions else "")
+        print(line)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "seed": args.seed,
+                    "min_time": args.min_time,
+                    "repeats": args.repeats
+                },
+                "results": results
+            }, f, indent=2)
+
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed more than {args.threshold:.0%} ({args.metric})", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Elasticsearch and Vertex AI (Gemini)
+Small stdlib HTTP servers speaking just enough of each API for the app:
+Elastic ping/index-exists/_search/_msearch (plain and stored-template, with
+filter_path and highlighting) and Vertex generateContent /
+streamGenerateContent / cachedContents. Latency and error rates are configurable, so load
+tests exercise real network paths without a cluster or Vertex quota.
+
+Usage (from backend/):
+    python -m benchmarks.standins --elastic-port 9200 --vertex-port 9300 \\
+        --elastic-latency lognormal:15:0.5 --vertex-latency lognormal:400:0.4 --vertex-error-rate 0.02
+
+    ELASTIC_ENDPOINT=http://127.0.0.1:9200 ELASTIC_API_KEY=standin \\
+    GCP_PROJECT=standin VERTEX_API_BASE=http://127.0.0.1:9300 VERTEX_ACCESS_TOKEN=standin \\
+        uvicorn app:app
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from benchmarks import data
+
+_TO_JSON = re.compile(r"\{\{#toJson\}\}(\w+)\{\{/toJson\}\}")
+_VARIABLE = re.compile(r"\{\{(\w+)\}\}")
+
+def render_template(source: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """The slice of Mustache the app's search templates use: {{name}} and {{#toJson}}name{{/toJson}}"""
+    source = _TO_JSON.sub(lambda match: json.dumps(params.get(match.group(1))), source)
+    return json.loads(_VARIABLE.sub(lambda match: str(params.get(match.group(1), "")), source))
+
+def filter_path(value: Any, paths: List[str]) -> Any:
+    """Elasticsearch's filter_path for plain dotted paths; emptied objects are dropped"""
+    def keep(node: Any, rests: List[List[str]]) -> Any:
+        if any(not rest for rest in rests):
+            return node
+        if isinstance(node, list):
+            kept = [keep(item, rests) for item in node]
+            return [item for item in kept if item not in (None, {}, [])]
+        if isinstance(node, dict):
+            out = {}
+            for key, child in node.items():
+                matching = [rest[1:] for rest in rests if rest[0] == key]
+                if matching:
+                    kept = keep(child, matching)
+                    if kept not in (None, {}, []):
+                        out[key] = kept
+            return out
+        return None
+
+    return keep(value, [path.split(".") for path in paths]) or {}
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Latency distribution in milliseconds, returned as a sampler of seconds:
+    "fixed:MS", "uniform:LOW:HIGH", "exp:MEAN" or "lognormal:MEDIAN:SIGMA"
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(":") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000 if values[0] else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        import math
+        mu = math.log(values[0]) if values[0] else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000 if values[0] else 0.0
+    raise ValueError(f"Invalid latency spec {spec!r}")
+
+class Behavior:
+    """Latency and failure injection shared by a stand-in's handler threads"""
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 1234):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def next(self) -> Tuple[float, bool]:
+        """(delay seconds, fail?) for one request"""
+        with self.lock:
+            self.requests += 1
+            fail = self.rng.random() < self.error_rate
+            self.errors += fail
+            return self.latency(self.rng), fail
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    behavior: Behavior
+    extra_headers: Dict[str, str] = {}
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, payload: Any = None, content_type: str = "application/json"):
+        body = b"" if payload is None else (payload if isinstance(payload, bytes) else json.dumps(payload).encode())
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in self.extra_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled (a losing hedge or a missed deadline)
+            self.close_connection = True
+
+    def _delay(self) -> bool:
+        """Sleep the sampled latency; True if this request should fail"""
+        delay, fail = self.behavior.next()
+        time.sleep(delay)
+        return fail
+
+class ElasticHandler(_Handler):
+    """Ping, index exists, stored scripts, _search and _msearch (plain or templated) over a seeded corpus"""
+    extra_headers = {"X-Elastic-Product": "Elasticsearch"}
+    docs: List[Dict[str, Any]] = []
+    scripts: Dict[str, str] = {}
+    index_name = "klein-ai-docs"
+
+    def _hit(self, i: int, rank: int, body: Dict[str, Any]) -> Dict[str, Any]:
+        doc = self.docs[i]
+        fields = body.get("_source", True)
+        source = {key: doc[key] for key in fields if key in doc} if isinstance(fields, list) else doc
+        hit = {"_index": self.index_name, "_id": str(i), "_score": round(10 - rank, 3), "_source": source}
+
+        highlight = body.get("highlight", {}).get("fields", {}).get("content")
+        if highlight is not None:
+            size = int(highlight.get("fragment_size", 100))
+            count = int(highlight.get("number_of_fragments", 5))
+            content = doc.get("content", "")
+            hit["highlight"] = {"content": [content[n:n + size] for n in range(0, min(len(content), size * count), size)]}
+        return hit
+
+    def _hits(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        size = int(body.get("size", 10))
+        query = json.dumps(body.get("query", {}))
+        # Stable per-query ranking without doing real scoring work
+        rng = random.Random(query)
+        hits = [
+            self._hit(i, rank, body)
+            for rank, i in enumerate(rng.sample(range(len(self.docs)), min(size, len(self.docs))))
+        ]
+        result: Dict[str, Any] = {"max_score": 10.0, "hits": hits}
+        if body.get("track_total_hits", True) is not False:
+            result["total"] = {"value": len(hits), "relation": "eq"}
+        return {"took": 1, "timed_out": False, "hits": result}
+
+    def _template_body(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        source = self.scripts.get(request["id"]) if "id" in request else request.get("source")
+        if source is None:
+            raise KeyError(request.get("id"))
+        if isinstance(source, dict):
+            source = json.dumps(source)
+        return render_template(source, request.get("params", {}))
+
+    def _send_filtered(self, status: int, payload: Dict[str, Any]):
+        paths = parse_qs(urlsplit(self.path).query).get("filter_path")
+        if paths:
+            payload = filter_path(payload, paths[0].split(","))
+        self._send(status, payload)
+
+    def _error(self) -> Dict[str, Any]:
+        return {
+            "error": {"type": "unavailable_shards_exception", "reason": "stand-in injected failure"},
+            "status": self.behavior.error_status
+        }
+
+    def do_HEAD(self):
+        path = urlsplit(self.path).path.strip("/")
+        if not path:
+            self._send(200)
+        else:
+            self._send(200 if path == self.index_name else 404)
+
+    def do_GET(self):
+        if urlsplit(self.path).path.strip("/"):
+            self._send(404, {"error": "not found", "status": 404})
+            return
+        self._send(200, {"name": "standin", "cluster_name": "standin", "version": {"number": "8.11.0"},
+                         "tagline": "You Know, for Search"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        raw = self._body()
+
+        if path.startswith("/_scripts/"):
+            script = json.loads(raw)["script"]
+            self.scripts[path[len("/_scripts/"):]] = script["source"]
+            self._send(200, {"acknowledged": True})
+        elif path.endswith("/_msearch") or path.endswith("/_msearch/template"):
+            templated = path.endswith("/template")
+            lines = [json.loads(line) for line in raw.splitlines() if line.strip()]
+            responses = []
+            for body in lines[1::2]:
+                if self._delay():
+                    responses.append(self._error())
+                else:
+                    responses.append({**self._hits(self._template_body(body) if templated else body), "status": 200})
+            self._send_filtered(200, {"took": 1, "responses": responses})
+        elif path.endswith("/_search") or path.endswith("/_search/template"):
+            body = json.loads(raw or b"{}")
+            if self._delay():
+                self._send(self.behavior.error_status, self._error())
+            else:
+                self._send_filtered(200, self._hits(self._template_body(body) if path.endswith("/template") else body))
+        else:
+            self._send(404, {"error": "not found", "status": 404})
+
+    do_PUT = do_POST
+
+class VertexHandler(_Handler):
+    """generateContent, streamGenerateContent and cachedContents for any project/model"""
+    route = re.compile(r"^/v1/projects/[^/]+/locations/[^/]+/publishers/google/models/([^/:]+):(\w+)$")
+    cache_route = re.compile(r"^/v1/(projects/[^/]+/locations/[^/]+/cachedContents)(?:/([^/]+))?$")
+    cached_contents: Dict[str, Dict[str, Any]] = {}
+    # Like Vertex, refuse to cache content smaller than this (estimated tokens)
+    min_cache_tokens = 0
+
+    def _not_found(self, message: str = "Not found"):
+        self._send(404, {"error": {"code": 404, "message": message, "status": "NOT_FOUND"}})
+
+    def _ttl(self, request: Dict[str, Any]) -> float:
+        return float(str(request.get("ttl", "3600s")).rstrip("s"))
+
+    def _cached_content(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self.cached_contents.get(name)
+        if entry is None or entry["expires_at"] <= time.time():
+            self.cached_contents.pop(name, None)
+            return None
+        return entry
+
+    def _cache_request(self, method: str):
+        url = urlsplit(self.path)
+        request = json.loads(self._body() or b"{}")
+        match = self.cache_route.match(url.path)
+        if not match:
+            self._not_found()
+            return
+        collection, cache_id = match.group(1), match.group(2)
+
+        if method == "POST" and cache_id is None:
+            text = "".join(part.get("text", "") for part in request.get("systemInstruction", {}).get("parts", []))
+            tokens = len(text) // 4
+            if tokens < self.min_cache_tokens:
+                self._send(400, {"error": {
+                    "code": 400,
+                    "message": f"Cached content is too small: {tokens} tokens, minimum is {self.min_cache_tokens}",
+                    "status": "INVALID_ARGUMENT"
+                }})
+                return
+            name = f"{collection}/{random.getrandbits(48):012x}"
+            self.cached_contents[name] = {
+                "name": name, "model": request.get("model"), "text": text, "tokens": tokens,
+                "expires_at": time.time() + self._ttl(request)
+            }
+            self._send(200, {"name": name, "model": request.get("model"), "usageMetadata": {"totalTokenCount": tokens}})
+            return
+
+        name = f"{collection}/{cache_id}"
+        entry = self._cached_content(name) if cache_id else None
+        if entry is None:
+            self._not_found(f"CachedContent {name} not found")
+        elif method == "PATCH":
+            entry["expires_at"] = time.time() + self._ttl(request)
+            self._send(200, {"name": name, "model": entry["model"]})
+        elif method == "DELETE":
+            self.cached_contents.pop(name, None)
+            self._send(200, {})
+        else:
+            self._send(200, {"name": name, "model": entry["model"], "usageMetadata": {"totalTokenCount": entry["tokens"]}})
+
+    def _answer(self, request: Dict[str, Any]) -> str:
+        text = ""
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                text += part.get("text", "")
+        match = re.search(r"User asks: (.*)", text)
+        question = match.group(1) if match else text[-80:]
+        return f"Here is some guidance on {question.strip()[:120]}. Stay safe and check local updates."
+
+    def _response(self, text: str, finish: Optional[str] = "STOP") -> Dict[str, Any]:
+        candidate: Dict[str, Any] = {"content": {"role": "model", "parts": [{"text": text}]}}
+        if finish:
+            candidate["finishReason"] = finish
+        return {
+            "candidates": [candidate],
+            "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text) // 4}
+        }
+
+    def do_GET(self):
+        self._cache_request("GET")
+
+    def do_PATCH(self):
+        self._cache_request("PATCH")
+
+    def do_DELETE(self):
+        self._cache_request("DELETE")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if self.cache_route.match(url.path):
+            self._cache_request("POST")
+            return
+        match = self.route.match(url.path)
+        request = json.loads(self._body() or b"{}")
+        if not match:
+            self._not_found()
+            return
+        if self.headers.get("Authorization", "") == "":
+            self._send(401, {"error": {"code": 401, "message": "Missing credentials", "status": "UNAUTHENTICATED"}})
+            return
+
+        cached_tokens = 0
+        if "cachedContent" in request:
+            if "systemInstruction" in request:
+                self._send(400, {"error": {
+                    "code": 400, "message": "systemInstruction cannot be set with cachedContent", "status": "INVALID_ARGUMENT"
+                }})
+                return
+            entry = self._cached_content(request["cachedContent"])
+            if entry is None:
+                self._not_found(f"CachedContent {request['cachedContent']} not found")
+                return
+            cached_tokens = entry["tokens"]
+
+        if self._delay():
+            status = self.behavior.error_status
+            self._send(status, {"error": {"code": status, "message": "stand-in injected failure", "status": "UNAVAILABLE"}})
+            return
+
+        text = self._answer(request)
+        method = match.group(2)
+        if method == "generateContent":
+            response = self._response(text)
+            if cached_tokens:
+                response["usageMetadata"]["cachedContentTokenCount"] = cached_tokens
+            self._send(200, response)
+        elif method == "streamGenerateContent":
+            words = text.split(" ")
+            third = max(1, len(words) // 3)
+            chunks = [" ".join(words[i:i + third]) + " " for i in range(0, len(words), third)]
+            events = [self._response(chunk, "STOP" if i == len(chunks) - 1 else None) for i, chunk in enumerate(chunks)]
+            if parse_qs(url.query).get("alt") == ["sse"]:
+                body = "".join(f"data: {json.dumps(event)}\r\n\r\n" for event in events)
+                self._send(200, body.encode(), "text/event-stream")
+            else:
+                self._send(200, events)
+        else:
+            self._send(404, {"error": {"code": 404, "message": f"Unknown method {method}", "status": "NOT_FOUND"}})
+
+class StandIn:
+    """One stand-in server running on a background thread"""
+
+    def __init__(self, handler: type, behavior: Behavior, port: int = 0, host: str = "127.0.0.1", **attrs: Any):
+        handler_class = type(handler.__name__, (handler,), {"behavior": behavior, **attrs})
+        self.behavior = behavior
+        self.server = ThreadingHTTPServer((host, port), handler_class)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"standin-{handler.__name__}", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandIn":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def elastic_standin(behavior: Behavior, port: int = 0, docs: int = 200, seed: int = 1234,
+                    content_chars: int = 240) -> StandIn:
+    return StandIn(ElasticHandler, behavior, port, docs=data.make_docs(random.Random(seed), docs, content_chars),
+                   scripts={})
+
+def vertex_standin(behavior: Behavior, port: int = 0, min_cache_tokens: int = 0) -> StandIn:
+    return StandIn(VertexHandler, behavior, port, cached_contents={}, min_cache_tokens=min_cache_tokens)
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Stand-in options shared with the load harness"""
+    parser.add_argument("--elastic-latency", default="lognormal:15:0.5", help="Elastic latency distribution (ms)")
+    parser.add_argument("--elastic-error-rate", type=float, default=0.0, help="Fraction of Elastic searches that fail")
+    parser.add_argument("--vertex-latency", default="lognormal:400:0.4", help="Vertex latency distribution (ms)")
+    parser.add_argument("--vertex-error-rate", type=float, default=0.0, help="Fraction of Vertex calls that fail")
+    parser.add_argument("--vertex-error-status", type=int, default=503, help="HTTP status of failed Vertex calls (e.g. 429)")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for latency, errors and the corpus")
+
+def start_standins(args: argparse.Namespace, elastic_port: int = 0, vertex_port: int = 0) -> Tuple[StandIn, StandIn]:
+    elastic = elastic_standin(
+        Behavior(args.elastic_latency, args.elastic_error_rate, 503, args.seed),
+        elastic_port, seed=args.seed
+    ).start()
+    vertex = vertex_standin(
+        Behavior(args.vertex_latency, args.vertex_error_rate, args.vertex_error_status, args.seed + 1),
+        vertex_port
+    ).start()
+    return elastic, vertex
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the Elasticsearch and Vertex AI stand-ins")
+    parser.add_argument("--elastic-port", type=int, default=9200)
+    parser.add_argument("--vertex-port", type=int, default=9300)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    elastic, vertex = start_standins(args, args.elastic_port, args.vertex_port)
+    print(f"Elasticsearch stand-in: {elastic.url}")
+    print(f"Vertex AI stand-in:     {vertex.url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"elastic {elastic.behavior.stats()}  vertex {vertex.behavior.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elastic.stop()
+        vertex.stop()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
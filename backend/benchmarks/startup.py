@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the FastAPI app
+Each run starts a fresh interpreter, imports app.py and serves the first
+chat requests in-process, for the stub, Elastic and Vertex configurations.
+
+The Elastic and Vertex configurations use the credentials in the current
+environment (ELASTIC_* / GCP_PROJECT + GOOGLE_*) and are skipped without them.
+The Vertex configuration only calls Gemini when VERTEX_GENERATE=true.
+
+Usage (from backend/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --config stub --runs 5 --warm --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ELASTIC_VARS = ("ELASTIC_API_KEY", "ELASTIC_ENDPOINT", "ELASTIC_CLOUD_ID", "ELASTIC_USER", "ELASTIC_PASS")
+VERTEX_VARS = ("GCP_PROJECT",)
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - started) * 1000
+
+from fastapi.testclient import TestClient
+
+result = {"import_ms": import_ms}
+started = time.perf_counter()
+with TestClient(app.app) as client:
+    result["startup_ms"] = (time.perf_counter() - started) * 1000
+    if sys.argv[1] == "1":
+        from services.warmup import warm_up
+        started = time.perf_counter()
+        warm_up()
+        result["warmup_ms"] = (time.perf_counter() - started) * 1000
+    for name in ("first_request_ms", "second_request_ms"):
+        started = time.perf_counter()
+        response = client.post("/api/chat", json={"message": "What is the weather in Port-au-Prince?"})
+        result[name] = (time.perf_counter() - started) * 1000
+        result["status"] = response.json().get("status")
+print(json.dumps(result))
+"""
+
+def _config_env(config: str) -> Optional[Dict[str, str]]:
+    """Environment for one configuration, or None if its credentials are missing"""
+    env = dict(os.environ)
+    if config == "stub":
+        cleared = ELASTIC_VARS + VERTEX_VARS
+    elif config == "elastic":
+        if not (env.get("ELASTIC_API_KEY") or env.get("ELASTIC_CLOUD_ID")):
+            return None
+        cleared = VERTEX_VARS
+    else:
+        if not env.get("GCP_PROJECT"):
+            return None
+        cleared = ELASTIC_VARS
+
+    for name in cleared:
+        env[name] = ""
+    # Measure the request path itself; warm-up is opt-in via --warm
+    env["WARMUP_ENABLED"] = "false"
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+def _parse_importtime(stderr: str) -> Dict[str, float]:
+    """Self import time per top-level package, in milliseconds"""
+    totals: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:"):].split("|")
+        totals[module.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(totals)
+
+def run_once(env: Dict[str, str], warm: bool) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory(prefix="klein-startup-") as workdir:
+        env = dict(env, RUNTIME_DIR=os.path.join(workdir, "runtime"))
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD, "1" if warm else "0"],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = _parse_importtime(completed.stderr)
+    return result
+
+def summarize(runs: List[Dict[str, object]]) -> Dict[str, object]:
+    summary: Dict[str, object] = {"runs": len(runs), "status": runs[-1]["status"]}
+    for key in ("import_ms", "startup_ms", "warmup_ms", "first_request_ms", "second_request_ms"):
+        if key in runs[0]:
+            summary[key] = round(statistics.median(run[key] for run in runs), 1)
+
+    imports: Dict[str, float] = defaultdict(float)
+    for run in runs:
+        for package, ms in run["imports"].items():
+            imports[package] += ms / len(runs)
+    heaviest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:8]
+    summary["heaviest_imports_ms"] = {package: round(ms, 1) for package, ms in heaviest}
+    return summary
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure import and first-request latency of the API")
+    parser.add_argument("--config", action="append", choices=["stub", "elastic", "vertex"],
+                        help="Configuration to measure (repeatable, default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per configuration")
+    parser.add_argument("--warm", action="store_true", help="Run the warm-up before the first request")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for config in args.config or ["stub", "elastic", "vertex"]:
+        env = _config_env(config)
+        if env is None:
+            print(f"{config:8s} skipped (no credentials in the environment)")
+            continue
+
+        summary = summarize([run_once(env, args.warm) for _ in range(args.runs)])
+        results[config] = summary
+
+        timings = "  ".join(
+            f"{key[:-3]}={summary[key]}ms"
+            for key in ("import_ms", "startup_ms", "warmup_ms", "first_request_ms", "second_request_ms")
+            if key in summary
+        )
+        print(f"{config:8s} {timings}  status={summary['status']}")
+        print(f"{'':8s} heaviest imports: " + ", ".join(f"{p} {ms}ms" for p, ms in summary["heaviest_imports_ms"].items()))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
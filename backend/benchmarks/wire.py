@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Wire format benchmark for the chat endpoints
+Compares bytes on the wire and framework CPU per request for:
+
+  json-declared  body declared as a ChatRequest parameter, ChatResponse
+                 returned through response_model (the previous endpoint shape)
+  json           parse_body() + render(): one validation pass in, one dump out
+  msgpack        the same path with MessagePack bodies (needs msgpack installed)
+
+Each variant is a minimal FastAPI app that returns a fixed ChatResponse, driven
+with direct ASGI calls on one event loop, so the numbers cover decoding,
+validation, serialization and routing only; no pipeline and no sockets.
+
+Usage (from backend/):
+    python -m benchmarks.wire
+    python -m benchmarks.wire --requests 5000 --json wire.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks import data
+
+def _apps(answer: str) -> Dict[str, Any]:
+    from fastapi import FastAPI, Request
+    from models.schemas import ChatRequest, ChatResponse
+    from routers.wire import parse_body, render
+
+    declared = FastAPI()
+    fast = FastAPI()
+
+    @declared.post("/chat", response_model=ChatResponse)
+    async def declared_chat(request: ChatRequest):
+        return ChatResponse(answer=answer, status="SAFE", lang="en")
+
+    @fast.post("/chat", response_model=ChatResponse)
+    async def fast_chat(http_request: Request):
+        await parse_body(http_request, ChatRequest)
+        return render(ChatResponse(answer=answer, status="SAFE", lang="en"), http_request)
+
+    return {"json-declared": declared, "json": fast, "msgpack": fast}
+
+def _encode(variant: str, payload: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """(body, content type) for a variant"""
+    if variant == "msgpack":
+        import msgpack
+        return msgpack.packb(payload, use_bin_type=True), b"application/msgpack"
+    return json.dumps(payload).encode("utf-8"), b"application/json"
+
+async def _call(app: Any, body: bytes, content_type: bytes) -> Tuple[int, bytes]:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat",
+        "raw_path": b"/chat",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", content_type),
+            (b"accept", content_type),
+            (b"content-length", str(len(body)).encode("ascii")),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+def run_variant(variant: str, chars: int, requests: int, repeats: int, seed: int) -> Optional[Dict[str, Any]]:
+    """CPU microseconds per request (best of `repeats` runs) and body sizes"""
+    if variant == "msgpack":
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            return None
+
+    rng = random.Random(f"{seed}:{chars}")
+    payload = data.make_chat_payload(rng, chars)
+    app = _apps(data.make_text(rng, chars))[variant]
+    body, content_type = _encode(variant, payload)
+
+    async def run() -> Tuple[List[float], int, bytes]:
+        status, response = await _call(app, body, content_type)
+        timings = []
+        for _ in range(repeats):
+            started = time.process_time()
+            for _ in range(requests):
+                await _call(app, body, content_type)
+            timings.append((time.process_time() - started) / requests)
+        return timings, status, response
+
+    timings, status, response = asyncio.run(run())
+    if status != 200:
+        raise RuntimeError(f"{variant} returned HTTP {status}: {response[:200]!r}")
+    return {
+        "request_bytes": len(body),
+        "response_bytes": len(response),
+        "cpu_us": round(min(timings) * 1e6, 2),
+        "requests": requests,
+        "repeats": repeats
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bytes on the wire and CPU per request, JSON vs MessagePack")
+    parser.add_argument("--chars", type=int, nargs="+", default=[64, 1024], help="Message and answer sizes")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per timed run")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per variant (best is reported)")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the synthetic payloads")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    for chars in args.chars:
+        baseline = None
+        for variant in ("json-declared", "json", "msgpack"):
+            name = f"{variant}[chars={chars}]"
+            result = run_variant(variant, chars, args.requests, args.repeats, args.seed)
+            if result is None:
+                print(f"{name:28s} skipped (pip install msgpack)")
+                continue
+            baseline = baseline or result["cpu_us"]
+            results[name] = result
+            print(
+                f"{name:28s} request={result['request_bytes']:>6d}B  response={result['response_bytes']:>6d}B"
+                f"  cpu={result['cpu_us']:>8.2f}us/request  x{result['cpu_us'] / baseline:.2f}"
+            )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "platform": platform.platform(), "seed": args.seed},
+                "results": results
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+from core.metrics import metrics_registry
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics_registry.counter(
+    "klein_cache_requests_total", "In-memory cache lookups by cache and result", ["cache", "result"]
+)
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL.
+
+    Expiry times are wall-clock, so entries exported to a snapshot keep
+    their remaining lifetime across a restart. Values must be JSON
+    serializable to be snapshotted; `decode` rebuilds them from JSON on
+    restore.
+    """
+
+    def __init__(self, name: str, capacity: int, ttl_s: float,
+                 decode: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.capacity = capacity
+        self.ttl_s = ttl_s
+        self.decode = decode
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hit = CACHE_REQUESTS.labels(cache=name, result="hit")
+        self._miss = CACHE_REQUESTS.labels(cache=name, result="miss")
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.ttl_s > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self._hit.inc()
+                    return entry[1]
+                del self._entries[key]
+        self._miss.inc()
+        return None
+
+    def put(self, key: str, value: Any, expires_at: Optional[float] = None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (expires_at or time.time() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def export(self) -> List[Tuple[str, float, bytes]]:
+        """Live entries as (key, expires_at, JSON value), least recently used first"""
+        now = time.time()
+        with self._lock:
+            items = [(key, entry) for key, entry in self._entries.items() if entry[0] > now]
+        return [(key, expires_at, json.dumps(value).encode("utf-8")) for key, (expires_at, value) in items]
+
+    def restore(self, entries: Iterable[Tuple[str, float, bytes]]) -> int:
+        """Load exported entries, skipping expired ones; returns how many were kept"""
+        now = time.time()
+        restored = 0
+        for key, expires_at, value in entries:
+            if expires_at > now:
+                value = json.loads(value)
+                self.put(key, self.decode(value) if self.decode else value, expires_at)
+                restored += 1
+        return restored
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "capacity": self.capacity, "ttl_s": self.ttl_s}
@@ -1,10 +1,30 @@
 from pydantic import BaseModel
 from typing import List
+import multiprocessing
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Backend root directory (holds the bundled data/ files)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bundled versions of the hot-reloaded data files
+DEFAULT_OPHIR_RULES_PATH = os.path.join(BASE_DIR, "data", "ophir_rules.json")
+DEFAULT_LOCAL_DOCS_PATH = os.path.join(BASE_DIR, "data", "local_docs.json")
+
+def _default_runtime_dir() -> str:
+    """
+    Directory keyed by the process that owns this server: the uvicorn
+    supervisor for its workers (and the reloader for a --reload server),
+    otherwise this process itself. Two servers started from the same shell
+    never share state.
+    """
+    parent = multiprocessing.parent_process()
+    owner = parent.pid if parent is not None else os.getpid()
+    return os.path.join(tempfile.gettempdir(), f"klein-ai-{owner}")
+
 class Settings(BaseModel):
     # Elastic Configuration
     elastic_cloud_id: str = os.getenv("ELASTIC_CLOUD_ID", "")
@@ -12,16 +32,133 @@ class Settings(BaseModel):
     elastic_pass: str = os.getenv("ELASTIC_PASS", "")
     elastic_endpoint: str = os.getenv("ELASTIC_ENDPOINT", "")
     elastic_api_key: str = os.getenv("ELASTIC_API_KEY", "")
+    # Context comes back as highlighted fragments of each hit's content, not the whole field
+    elastic_fragment_chars: int = int(os.getenv("ELASTIC_FRAGMENT_CHARS", "300"))
+    elastic_fragments: int = int(os.getenv("ELASTIC_FRAGMENTS", "2"))
 
     # Google Cloud Configuration
     gcp_project: str = os.getenv("GCP_PROJECT", "")
     gcp_location: str = os.getenv("GCP_LOCATION", "us-central1")
     vertex_model: str = os.getenv("VERTEX_MODEL", "text-bison@001")
+    # Live Gemini generateContent calls (billed; needs a Gemini VERTEX_MODEL).
+    # Off: a configured project gets the canned Vertex responses
+    vertex_generate: bool = os.getenv("VERTEX_GENERATE", "false").lower() == "true"
+    # Overrides for load testing against a stand-in (benchmarks/standins.py)
+    vertex_api_base: str = os.getenv("VERTEX_API_BASE", "")
+    vertex_access_token: str = os.getenv("VERTEX_ACCESS_TOKEN", "")
+    # Raced generation: give up on Vertex after VERTEX_DEADLINE_S and answer from
+    # the cache or stub; send a second request once a call runs past the
+    # VERTEX_HEDGE_PERCENTILE of recent latencies, at most VERTEX_HEDGE_BUDGET
+    # hedges per call (0 disables either)
+    vertex_deadline_s: float = float(os.getenv("VERTEX_DEADLINE_S", "8"))
+    vertex_hedge_percentile: float = float(os.getenv("VERTEX_HEDGE_PERCENTILE", "95"))
+    vertex_hedge_min_delay_s: float = float(os.getenv("VERTEX_HEDGE_MIN_DELAY_S", "0.25"))
+    vertex_hedge_budget: float = float(os.getenv("VERTEX_HEDGE_BUDGET", "0.1"))
+    # System prompts registered with Vertex context caching and sent by handle (0 disables)
+    vertex_prompt_cache_ttl_s: int = int(os.getenv("VERTEX_PROMPT_CACHE_TTL_S", "3600"))
 
     # Service Flags
     energy_mode: str = os.getenv("ENERGY_MODE", "normal")
     allow_shutdown: bool = os.getenv("ALLOW_SHUTDOWN", "true").lower() == "true"
 
+    # Shared runtime files for all workers on this node (system state, metrics, ...).
+    # Defaults to a directory keyed by the supervising process (see _default_runtime_dir)
+    runtime_dir: str = os.getenv("RUNTIME_DIR") or _default_runtime_dir()
+
+    # Context Budgets (retrieved context per energy mode, in CONTEXT_BUDGET_UNIT)
+    context_budget_unit: str = os.getenv("CONTEXT_BUDGET_UNIT", "chars")  # "chars" or "tokens"
+    context_budget_normal: int = int(os.getenv("CONTEXT_BUDGET_NORMAL", "1200"))
+    context_budget_peak: int = int(os.getenv("CONTEXT_BUDGET_PEAK", "300"))
+
+    # Intent routing rules for stub mode and the chat fallback
+    intent_rules_path: str = os.getenv("INTENT_RULES_PATH") or os.path.join(BASE_DIR, "data", "intents.json")
+
+    # Per-language analyzers and detection markers (en, fr, ht)
+    languages_path: str = os.getenv("LANGUAGES_PATH") or os.path.join(BASE_DIR, "data", "languages.json")
+
+    # Hot-reloaded data files (polled every RELOAD_INTERVAL_S; 0 disables)
+    ophir_rules_path: str = os.getenv("OPHIR_RULES_PATH") or DEFAULT_OPHIR_RULES_PATH
+    local_docs_path: str = os.getenv("LOCAL_DOCS_PATH") or DEFAULT_LOCAL_DOCS_PATH
+    reload_interval_s: float = float(os.getenv("RELOAD_INTERVAL_S", "2"))
+
+    # Logging: records go through a bounded queue to a background writer thread
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    log_sample_rate: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))  # fraction of DEBUG/INFO records kept
+    log_rate_limit: float = float(os.getenv("LOG_RATE_LIMIT", "50"))  # DEBUG/INFO records per second per call site
+
+    # Request Tracing (tail-sampled into an in-memory ring buffer)
+    trace_enabled: bool = os.getenv("TRACE_ENABLED", "false").lower() == "true"
+    trace_buffer_size: int = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+    trace_slow_ms: float = float(os.getenv("TRACE_SLOW_MS", "500"))
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+    # Debug endpoints (/api/debug/*) are disabled unless a token is set
+    debug_token: str = os.getenv("DEBUG_TOKEN", "")
+
+    # On-demand request profiling (X-Klein-Profile: <DEBUG_TOKEN>)
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+    profile_buffer_size: int = int(os.getenv("PROFILE_BUFFER_SIZE", "20"))
+    profile_dir: str = os.getenv("PROFILE_DIR", "")
+
+    # Blocking stage executor and event-loop lag monitoring
+    executor_threads: int = int(os.getenv("EXECUTOR_THREADS", "8"))
+    executor_max_queue: int = int(os.getenv("EXECUTOR_MAX_QUEUE", "32"))
+    ophir_executor: str = os.getenv("OPHIR_EXECUTOR", "thread")  # "thread" or "process"
+    ophir_processes: int = int(os.getenv("OPHIR_PROCESSES", "2"))
+    loop_lag_interval_ms: float = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+
+    # Background dependency probes backing /api/health
+    health_probe_interval_s: float = float(os.getenv("HEALTH_PROBE_INTERVAL_S", "10"))
+    health_probe_timeout_s: float = float(os.getenv("HEALTH_PROBE_TIMEOUT_S", "2"))
+
+    # Cold start: load lazy clients and exercise the pipeline once the worker is up
+    warmup_enabled: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    warmup_delay_s: float = float(os.getenv("WARMUP_DELAY_S", "0.5"))
+
+    # Per-client rate limiting (token buckets shared by all workers on the node).
+    # Off by default: behind a proxy every caller shares the proxy's IP unless
+    # RATE_LIMIT_TRUST_FORWARDED is also set
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+    rate_limit_key: str = os.getenv("RATE_LIMIT_KEY", "ip")  # "ip", "api_key" or "header:<name>"
+    rate_limit_trust_forwarded: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+    rate_limit_chat_rate: float = float(os.getenv("RATE_LIMIT_CHAT_RATE", "1"))  # tokens per second
+    rate_limit_chat_burst: float = float(os.getenv("RATE_LIMIT_CHAT_BURST", "10"))
+    rate_limit_control_rate: float = float(os.getenv("RATE_LIMIT_CONTROL_RATE", "0.2"))
+    rate_limit_control_burst: float = float(os.getenv("RATE_LIMIT_CONTROL_BURST", "5"))
+    rate_limit_shards: int = int(os.getenv("RATE_LIMIT_SHARDS", "64"))
+    rate_limit_shard_slots: int = int(os.getenv("RATE_LIMIT_SHARD_SLOTS", "256"))
+
+    # Conversation memory for requests carrying a session_id (per worker)
+    session_memory_enabled: bool = os.getenv("SESSION_MEMORY_ENABLED", "true").lower() == "true"
+    session_max_turns: int = int(os.getenv("SESSION_MAX_TURNS", "8"))
+    session_max_bytes: int = int(os.getenv("SESSION_MAX_BYTES", "4096"))
+    session_memory_budget_mb: int = int(os.getenv("SESSION_MEMORY_BUDGET_MB", "256"))
+    session_ttl_s: float = float(os.getenv("SESSION_TTL_S", "1800"))
+    # Recent turns passed to Klein per energy mode, in CONTEXT_BUDGET_UNIT
+    session_summary_budget_normal: int = int(os.getenv("SESSION_SUMMARY_BUDGET_NORMAL", "600"))
+    session_summary_budget_peak: int = int(os.getenv("SESSION_SUMMARY_BUDGET_PEAK", "150"))
+
+    # Retrieval and generated-answer caches (LRU with a TTL, per worker; 0 disables)
+    retrieval_cache_size: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048"))
+    retrieval_cache_ttl_s: float = float(os.getenv("RETRIEVAL_CACHE_TTL_S", "300"))
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+    answer_cache_ttl_s: float = float(os.getenv("ANSWER_CACHE_TTL_S", "600"))
+
+    # Cache snapshots for warm restarts. They hold session transcripts and answers,
+    # so they are off until SNAPSHOT_PATH names a private location that outlives the process
+    snapshot_path: str = os.getenv("SNAPSHOT_PATH", "")
+    snapshot_interval_s: float = float(os.getenv("SNAPSHOT_INTERVAL_S", "60"))
+    snapshot_max_age_s: float = float(os.getenv("SNAPSHOT_MAX_AGE_S", "3600"))
+
+    # Graceful shutdown: how long to wait for in-flight requests and audit writes
+    drain_timeout_s: float = float(os.getenv("DRAIN_TIMEOUT_S", "25"))
+
+    # Batch Chat
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
     # CORS Configuration
     cors_origins: List[str] = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 
@@ -30,3 +167,7 @@ class Settings(BaseModel):
     app_version: str = "1.0.0"
 
 settings = Settings()
+
+# Pass the resolved directory down explicitly: processes this worker starts
+# (the Ophir pool, the batch runner's workers) would otherwise key on it instead
+os.environ["RUNTIME_DIR"] = settings.runtime_dir
@@ -0,0 +1,93 @@
+from core.metrics import metrics_registry
+from core.state import system_state
+from core.executor import stage_executor
+from typing import Any, Dict
+import asyncio
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_IN_FLIGHT = metrics_registry.gauge(
+    "klein_requests_in_flight", "Chat requests being processed"
+)
+
+class _InFlight:
+    __slots__ = ("controller",)
+
+    def __init__(self, controller: "DrainController"):
+        self.controller = controller
+
+    def __enter__(self):
+        self.controller.in_flight += 1
+        REQUESTS_IN_FLIGHT.set(self.controller.in_flight)
+
+    def __exit__(self, *exc):
+        self.controller.in_flight -= 1
+        REQUESTS_IN_FLIGHT.set(self.controller.in_flight)
+        return False
+
+class DrainController:
+    """
+    Tracks this worker's in-flight chat requests and drains them on shutdown.
+
+    New work is refused while this worker shuts down or while a
+    /api/shutdown is in progress on any worker (the shared `draining` flag).
+    A drain then waits, up to its deadline, for this worker's tracked
+    requests and stage-executor calls (generations, Ophir, audit writes) to
+    finish. Requests already running on other workers are not waited for;
+    they finish on their own while those workers refuse new work.
+    Counters are only touched on the event loop, so no lock is needed.
+    """
+
+    def __init__(self, poll_interval: float = 0.05):
+        self.poll_interval = poll_interval
+        self.in_flight = 0
+        self.draining = False
+
+    @property
+    def accepting(self) -> bool:
+        return not self.draining and not system_state.draining
+
+    def track(self) -> _InFlight:
+        """Count a request as in flight until the context exits"""
+        return _InFlight(self)
+
+    def _executor_busy(self) -> int:
+        return sum(pool["in_flight"] for pool in stage_executor.status().values())
+
+    async def drain(self, timeout: float, reason: str) -> Dict[str, Any]:
+        """
+        Wait for this worker's in-flight work to finish
+
+        Returns:
+            Dict[str, Any]: Drain outcome for the audit log
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        at_start = self.in_flight
+        logger.info("Draining (%s): %d requests in flight, %d executor calls", reason, at_start, self._executor_busy())
+
+        while (self.in_flight or self._executor_busy()) and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+
+        outcome = {
+            "reason": reason,
+            "scope": "worker",
+            "pid": os.getpid(),
+            "drained": not self.in_flight and not self._executor_busy(),
+            "in_flight_at_start": at_start,
+            "requests_remaining": self.in_flight,
+            "executor_calls_remaining": self._executor_busy(),
+            "waited_ms": round((time.monotonic() - started) * 1000, 1),
+            "timeout_s": timeout
+        }
+        if outcome["drained"]:
+            logger.info("Drain complete in %.1fms", outcome["waited_ms"])
+        else:
+            logger.warning(f"Drain deadline reached with {self.in_flight} requests still in flight")
+        return outcome
+
+# Global instance
+drain_controller = DrainController()
@@ -0,0 +1,173 @@
+from core.config import settings
+from core.metrics import metrics_registry
+from core.logs import configure_worker_logging
+from core.reload import reload_watcher
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_IN_FLIGHT = metrics_registry.gauge(
+    "klein_executor_in_flight", "Blocking pipeline calls running or queued, by pool", ["pool"]
+)
+EXECUTOR_QUEUE_SECONDS = metrics_registry.histogram(
+    "klein_executor_queue_seconds", "Time a blocking stage waited for a pool worker", ["stage"]
+)
+EXECUTOR_REJECTED = metrics_registry.counter(
+    "klein_executor_rejected_total", "Stage calls shed because the pool was saturated", ["stage"]
+)
+LOOP_LAG_SECONDS = metrics_registry.histogram(
+    "klein_event_loop_lag_seconds", "Event loop scheduling lag",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+def _init_process_worker():
+    """
+    Ophir worker processes log directly (the parent's queue listener does not
+    exist here), export their own metrics file and watch the rule files too
+    """
+    configure_worker_logging()
+    metrics_registry.start_flusher()
+    reload_watcher.start()
+
+class ExecutorSaturated(Exception):
+    """Raised instead of queueing when a stage pool is full"""
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task.
+    Any blocking call on the loop shows up here as lag.
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 50):
+        self.interval = interval
+        self.window = window
+        self.current = 0.0
+        self.recent_max = 0.0
+        self._samples = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+
+            self.current = lag
+            self._samples.append(lag)
+            if len(self._samples) > self.window:
+                self._samples.pop(0)
+            self.recent_max = max(self._samples)
+            LOOP_LAG_SECONDS.observe(lag)
+
+    def status(self) -> Dict[str, float]:
+        return {
+            "current_ms": round(self.current * 1000, 3),
+            "recent_max_ms": round(self.recent_max * 1000, 3)
+        }
+
+class _Pool:
+    """An executor with a hard cap on running + queued calls"""
+
+    def __init__(self, name: str, executor, workers: int, max_queue: int):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.in_flight = 0
+        self.gauge = EXECUTOR_IN_FLIGHT.labels(pool=name)
+
+    @property
+    def saturation(self) -> float:
+        return self.in_flight / self.capacity
+
+class StageExecutor:
+    """
+    Runs the blocking pipeline stages (retrieval, Klein, Ophir, audit) off the
+    event loop. Threads handle I/O-bound stages; OPHIR_EXECUTOR=process moves
+    Ophir's CPU-bound scoring to a process pool. A full pool rejects new calls
+    with ExecutorSaturated so the caller can shed load instead of queueing.
+    """
+
+    def __init__(self):
+        self.thread_pool = _Pool(
+            "thread",
+            ThreadPoolExecutor(max_workers=settings.executor_threads, thread_name_prefix="klein-stage"),
+            settings.executor_threads,
+            settings.executor_max_queue
+        )
+        self.process_pool: Optional[_Pool] = None
+        if settings.ophir_executor == "process":
+            self.process_pool = _Pool(
+                "process",
+                # Spawned, not forked: a fork of this multi-threaded process would
+                # inherit locks and handlers whose threads do not exist in the child
+                ProcessPoolExecutor(
+                    max_workers=settings.ophir_processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process_worker
+                ),
+                settings.ophir_processes,
+                settings.executor_max_queue
+            )
+
+    async def run(self, stage: str, fn: Callable[..., Any], *args: Any, cpu_bound: bool = False) -> Any:
+        """Run fn(*args) in the stage pool and await the result"""
+        if cpu_bound and self.process_pool is not None:
+            pool = self.process_pool
+            call = functools.partial(fn, *args)
+        else:
+            # Carry contextvars (trace, request id) into the worker thread
+            pool = self.thread_pool
+            call = functools.partial(contextvars.copy_context().run, fn, *args)
+
+        if pool.in_flight >= pool.capacity:
+            EXECUTOR_REJECTED.inc(stage=stage)
+            raise ExecutorSaturated(f"{pool.name} pool saturated ({pool.in_flight}/{pool.capacity})")
+
+        submitted = time.perf_counter()
+        wait_timer = EXECUTOR_QUEUE_SECONDS.labels(stage=stage)
+
+        def timed_call():
+            wait_timer.observe(time.perf_counter() - submitted)
+            return call()
+
+        pool.in_flight += 1
+        pool.gauge.set(pool.in_flight)
+        try:
+            target = call if pool is self.process_pool else timed_call
+            return await asyncio.get_running_loop().run_in_executor(pool.executor, target)
+        finally:
+            pool.in_flight -= 1
+            pool.gauge.set(pool.in_flight)
+
+    def status(self) -> Dict[str, Any]:
+        pools = [self.thread_pool] + ([self.process_pool] if self.process_pool else [])
+        return {
+            pool.name: {
+                "in_flight": pool.in_flight,
+                "capacity": pool.capacity,
+                "saturation": round(pool.saturation, 3)
+            }
+            for pool in pools
+        }
+
+    def shutdown(self, wait: bool = True):
+        self.thread_pool.executor.shutdown(wait=wait)
+        if self.process_pool:
+            self.process_pool.executor.shutdown(wait=wait)
+
+# Global instances
+stage_executor = StageExecutor()
+loop_monitor = LoopLagMonitor(interval=settings.loop_lag_interval_ms / 1000)
@@ -0,0 +1,200 @@
+from core.metrics import metrics_registry
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+HEDGED_REQUESTS = metrics_registry.counter(
+    "klein_hedged_requests_total", "Hedged second attempts: sent, won, or skipped for lack of budget",
+    ["target", "result"]
+)
+DEADLINE_EXCEEDED = metrics_registry.counter(
+    "klein_deadline_exceeded_total", "Raced calls abandoned at their deadline", ["target"]
+)
+
+class DeadlineExceeded(Exception):
+    """Raised when no attempt of a raced call finished before its deadline"""
+
+class LatencyTracker:
+    """Latency percentiles over the most recent successful attempts"""
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._sorted: Optional[List[float]] = None
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p-th percentile in seconds, None until min_samples were observed"""
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * p / 100))
+        return self._sorted[index]
+
+class HedgeBudget:
+    """
+    Token bucket for hedges: every call earns `ratio` tokens (up to `burst`)
+    and every hedge spends one, so hedges never exceed that fraction of
+    calls. When the backend slows down for everyone, the extra load stays
+    bounded instead of doubling.
+    """
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def earn(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+class Hedger:
+    """
+    Races attempts of one call: a second attempt starts once the first has
+    run longer than the recent `percentile` latency (never sooner than
+    `min_delay_s`), the first success wins and the others are cancelled. A
+    failed attempt is not retried. With `deadline_s` set, the whole race is
+    abandoned with DeadlineExceeded at that point.
+
+    Runs on a single event loop; its latency window and budget are not
+    shared across threads.
+    """
+
+    def __init__(self, target: str, deadline_s: float = 0.0, percentile: float = 95.0,
+                 min_delay_s: float = 0.25, budget: Optional[HedgeBudget] = None):
+        self.target = target
+        self.deadline_s = deadline_s
+        self.percentile = percentile
+        self.min_delay_s = min_delay_s
+        self.budget = budget or HedgeBudget(0.1)
+        self.latency = LatencyTracker()
+        self._sent = HEDGED_REQUESTS.labels(target=target, result="sent")
+        self._won = HEDGED_REQUESTS.labels(target=target, result="won")
+        self._skipped = HEDGED_REQUESTS.labels(target=target, result="skipped")
+
+    @property
+    def active(self) -> bool:
+        """False when neither hedging nor a deadline is configured"""
+        return self.percentile > 0 or self.deadline_s > 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds before a hedge is sent; None while the latency window is still filling"""
+        if self.percentile <= 0:
+            return None
+        tail = self.latency.percentile(self.percentile)
+        if tail is None:
+            return None
+        return max(self.min_delay_s, tail)
+
+    async def run(self, attempt: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Race attempt() calls and return the first successful result
+
+        Args:
+            hedge: Allow a second attempt (the deadline applies either way)
+
+        Raises:
+            DeadlineExceeded: Nothing finished before the deadline
+            Exception: Every attempt failed; the last error is re-raised
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.deadline_s if self.deadline_s > 0 else None
+
+        self.budget.earn()
+        delay = self.hedge_delay() if hedge else None
+        hedge_at = started + delay if delay is not None else None
+        if hedge_at is not None and deadline is not None and hedge_at >= deadline:
+            hedge_at = None
+
+        async def timed() -> T:
+            attempt_started = loop.time()
+            result = await attempt()
+            self.latency.observe(loop.time() - attempt_started)
+            return result
+
+        primary = loop.create_task(timed())
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                wakeups = [at for at in (hedge_at, deadline) if at is not None]
+                timeout = max(0.0, min(wakeups) - loop.time()) if wakeups else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._won.inc()
+                        return task.result()
+                    error = task.exception()
+
+                now = loop.time()
+                if deadline is not None and now >= deadline and pending:
+                    DEADLINE_EXCEEDED.inc(target=self.target)
+                    raise DeadlineExceeded(f"{self.target} call exceeded its {self.deadline_s:g}s deadline")
+
+                if hedge_at is not None and now >= hedge_at and pending:
+                    hedge_at = None
+                    if self.budget.try_spend():
+                        self._sent.inc()
+                        pending.add(loop.create_task(timed()))
+                    else:
+                        self._skipped.inc()
+
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            # A slow primary that lost still belongs in the latency window;
+            # its elapsed time is a lower bound on what it would have taken
+            if primary in pending:
+                self.latency.observe(loop.time() - started)
+
+    def status(self) -> Dict[str, Optional[float]]:
+        delay = self.hedge_delay()
+        return {
+            "deadline_s": self.deadline_s or None,
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "budget_tokens": round(self.budget.tokens, 2)
+        }
+
+class BackgroundLoop:
+    """
+    An event loop on a daemon thread, started on first use. Lets the
+    synchronous stage threads run async clients whose in-flight requests
+    can actually be cancelled.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the loop and block the calling thread for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop()).result()
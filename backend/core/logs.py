@@ -0,0 +1,234 @@
+from core.config import settings
+from core.metrics import metrics_registry
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+LOG_RECORDS_DROPPED = metrics_registry.counter(
+    "klein_log_records_dropped_total", "Log records dropped before being written", ["reason"]
+)
+
+_REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("klein_request_id", default=None)
+
+# Uvicorn configures these with their own synchronous handlers
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; runs on the listener thread only"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+class SamplingFilter(logging.Filter):
+    """
+    Thins out high-volume DEBUG/INFO records in the calling thread, before
+    they are queued. Records are sampled at `sample_rate`, then each call
+    site (file and line) gets a token bucket of `per_second` records.
+    Warnings and errors always pass.
+    """
+
+    def __init__(self, sample_rate: float, per_second: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.per_second = per_second
+        self._buckets: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+        self._sampled = LOG_RECORDS_DROPPED.labels(reason="sampled")
+        self._limited = LOG_RECORDS_DROPPED.labels(reason="rate_limited")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._sampled.inc()
+            return False
+
+        if self.per_second <= 0:
+            return True
+
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.per_second, now]
+            tokens = min(self.per_second, bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                self._limited.inc()
+                return False
+            bucket[0] = tokens - 1.0
+        return True
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting or blocking.
+
+    The stock QueueHandler formats the message in the caller so records can
+    be pickled; ours stay in-process, so formatting is left to the listener
+    and only happens for records that are actually written. A full queue
+    drops the record instead of stalling the caller.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Context variables are not visible on the listener thread
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+class LoggingPipeline:
+    """Root logging through a bounded queue to a background writer thread"""
+
+    def __init__(self):
+        self.listener: Optional[QueueListener] = None
+
+    def configure(self, level: str = "INFO", fmt: str = "json", queue_size: int = 10000,
+                  sample_rate: float = 1.0, per_second: float = 0.0):
+        """Replace the root handlers (idempotent; the last call wins)"""
+        self.stop()
+
+        writer = logging.StreamHandler(sys.stderr)
+        writer.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+        handler = _NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        handler.addFilter(SamplingFilter(sample_rate, per_second))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+        for name in _UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        self.listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+        self.listener.start()
+
+    def configure_direct(self, level: str = "INFO", fmt: str = "json",
+                         sample_rate: float = 1.0, per_second: float = 0.0):
+        """
+        Write records synchronously from the calling thread, for pool worker
+        processes that have no listener thread of their own
+        """
+        self.stop()
+
+        writer = logging.StreamHandler(sys.stderr)
+        writer.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        writer.addFilter(SamplingFilter(sample_rate, per_second))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(writer)
+        root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    def stop(self):
+        """Flush queued records and stop the writer thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+def configure_logging():
+    """Set up the logging pipeline from settings"""
+    logging_pipeline.configure(
+        level=settings.log_level,
+        fmt=settings.log_format,
+        queue_size=settings.log_queue_size,
+        sample_rate=settings.log_sample_rate,
+        per_second=settings.log_rate_limit
+    )
+
+def configure_worker_logging():
+    """Set up direct logging in a pool worker process from settings"""
+    logging_pipeline.configure_direct(
+        level=settings.log_level,
+        fmt=settings.log_format,
+        sample_rate=settings.log_sample_rate,
+        per_second=settings.log_rate_limit
+    )
+
+class RequestIdMiddleware:
+    """
+    Tags every HTTP request with an ID for log correlation.
+    A well-formed incoming X-Request-ID is kept, otherwise one is generated;
+    it is echoed back on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == _REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        header = (_REQUEST_ID_HEADER, request_id.encode("latin-1"))
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+# Global instance
+logging_pipeline = LoggingPipeline()
@@ -0,0 +1,303 @@
+from core.config import settings
+from core.state import system_state
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Timer:
+    """Context manager that observes elapsed seconds into a histogram child"""
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: "_HistogramChild"):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+class _CounterChild:
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+class _HistogramChild:
+    __slots__ = ("lock", "buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        """Child for one label combination; bind once and reuse on hot paths"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        self.labels(**labels).inc(amount)
+
+    def snapshot(self) -> List[list]:
+        return [[list(key), child.value] for key, child in list(self._children.items())]
+
+class Gauge(_Metric):
+    """
+    Point-in-time value. Across workers, gauges are summed over live
+    workers only, so a dead worker's last value does not linger.
+    """
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float, **labels: str):
+        self.labels(**labels).set(value)
+
+    def snapshot(self) -> List[list]:
+        return [[list(key), child.value] for key, child in list(self._children.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels: str):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels: str) -> _Timer:
+        return _Timer(self.labels(**labels))
+
+    def snapshot(self) -> List[list]:
+        samples = []
+        for key, child in list(self._children.items()):
+            with child.lock:
+                samples.append([list(key), list(child.counts), child.sum])
+        return samples
+
+class MetricsRegistry:
+    """
+    Process-local metrics with cross-worker aggregation.
+
+    Each worker periodically writes its snapshot to RUNTIME_DIR/metrics/<pid>.json;
+    rendering merges every worker's latest snapshot, so /metrics reports
+    node totals no matter which worker serves the scrape.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics: Dict[str, _Metric] = {}
+        self._flusher: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+        if system_state.first_worker:
+            # Fresh run: drop snapshots left behind by a previous one
+            for path in glob.glob(os.path.join(directory, "*.json")):
+                os.remove(path)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric) -> Any:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def flush(self):
+        """Write this worker's snapshot for other workers to aggregate"""
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to write metrics snapshot: {e}")
+
+    def start_flusher(self):
+        """Start the background snapshot writer (once per worker)"""
+        if self._flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def _collect(self) -> Dict[str, Dict[tuple, Any]]:
+        """Merge the snapshots of every worker (this one live, others from disk)"""
+        snapshots = [(True, self.snapshot())]
+        own_file = f"{os.getpid()}.json"
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            name = os.path.basename(path)
+            if name == own_file:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshots.append((_pid_alive(int(name[:-5])), json.load(f)))
+            except (OSError, ValueError):
+                continue
+
+        merged: Dict[str, Dict[tuple, Any]] = {name: {} for name in self.metrics}
+        for alive, snapshot in snapshots:
+            for name, samples in snapshot.items():
+                if name not in merged:
+                    continue
+                metric = self.metrics[name]
+                if metric.kind == "gauge" and not alive:
+                    continue
+                for sample in samples:
+                    key = tuple(sample[0])
+                    if metric.kind in ("counter", "gauge"):
+                        merged[name][key] = merged[name].get(key, 0.0) + sample[1]
+                    else:
+                        counts, total = merged[name].get(key, ([0] * (len(metric.buckets) + 1), 0.0))
+                        merged[name][key] = ([a + b for a, b in zip(counts, sample[1])], total + sample[2])
+        return merged
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, samples in self._collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+
+            for key, value in sorted(samples.items()):
+                pairs = [f'{label}="{_escape(v)}"' for label, v in zip(metric.labelnames, key)]
+
+                if metric.kind in ("counter", "gauge"):
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    le_pair = f'le="{le}"'
+                    lines.append(f"{name}_bucket{_labels(pairs + [le_pair])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":  # os.kill(pid, 0) sends CTRL_C_EVENT on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(pairs: List[str]) -> str:
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+# Global registry
+metrics_registry = MetricsRegistry(os.path.join(settings.runtime_dir, "metrics"))
+
+# Pipeline stage metrics
+CHAT_REQUESTS = metrics_registry.counter(
+    "klein_chat_requests_total", "Chat requests by final status and energy mode", ["status", "mode"]
+)
+CHAT_SECONDS = metrics_registry.histogram(
+    "klein_chat_request_seconds", "Chat pipeline latency by energy mode", ["mode"]
+)
+RETRIEVAL_SECONDS = metrics_registry.histogram(
+    "klein_retrieval_seconds", "RetrievalService.search_context latency", ["backend"]
+)
+GENERATION_SECONDS = metrics_registry.histogram(
+    "klein_generation_seconds", "Klein response generation latency", ["backend"]
+)
+OPHIR_SECONDS = metrics_registry.histogram(
+    "klein_ophir_evaluate_seconds", "OphirService.evaluate_response latency"
+)
+AUDIT_WRITE_SECONDS = metrics_registry.histogram(
+    "klein_audit_write_seconds", "Audit log write latency", ["service"]
+)
@@ -0,0 +1,151 @@
+from core.config import settings
+from collections import deque, Counter
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-klein-profile"
+
+class Profile:
+    """Collapsed-stack samples for one profiled request"""
+
+    def __init__(self, label: str, interval: float):
+        self.profile_id = uuid.uuid4().hex
+        self.label = label
+        self.interval = interval
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.duration_ms = 0.0
+        self.stacks: Counter = Counter()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed format: 'frame;frame;frame count' per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000
+        }
+
+class _Sampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, profile: Profile, thread_id: int):
+        self.profile = profile
+        self.thread_id = thread_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def __enter__(self) -> Profile:
+        request_profiler._acquire_switch_interval()
+        self.started = time.perf_counter()
+        self.thread.start()
+        return self.profile
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        request_profiler._release_switch_interval()
+        self.profile.duration_ms = (time.perf_counter() - self.started) * 1000
+        request_profiler._store(self.profile)
+        return False
+
+    def _run(self):
+        while not self.stopped.wait(self.profile.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.profile.stacks[";".join(reversed(stack))] += 1
+
+class RequestProfiler:
+    """
+    On-demand sampling profiler for individual requests.
+    A request opts in with the X-Klein-Profile header carrying DEBUG_TOKEN;
+    requests without it never touch the profiler.
+    """
+
+    def __init__(self, interval_ms: float = 1.0, capacity: int = 20, output_dir: str = ""):
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self.profiles: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._saved_switch_interval = sys.getswitchinterval()
+
+    def _acquire_switch_interval(self):
+        # The sampler needs the GIL to look at the profiled thread; shorten the
+        # switch interval while any profile runs so samples land on schedule
+        with self._lock:
+            if self._active == 0:
+                self._saved_switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self._saved_switch_interval, self.interval / 2))
+            self._active += 1
+
+    def _release_switch_interval(self):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                sys.setswitchinterval(self._saved_switch_interval)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        if not settings.debug_token or not token:
+            return False
+        if hmac.compare_digest(token.encode("utf-8"), settings.debug_token.encode("utf-8")):
+            return True
+        logger.warning("Ignoring profile request with an invalid token")
+        return False
+
+    def profile(self, label: str) -> _Sampler:
+        """Profile the calling thread until the context exits"""
+        return _Sampler(Profile(label, self.interval), threading.get_ident())
+
+    def _store(self, profile: Profile):
+        self.profiles.append(profile)
+        logger.info(f"Captured request profile {profile.profile_id}: {profile.samples} samples in {profile.duration_ms:.1f}ms")
+
+        if self.output_dir:
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, f"{profile.profile_id}.collapsed")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(profile.collapsed())
+            except Exception as e:
+                logger.error(f"Failed to write profile: {e}")
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        for profile in self.profiles:
+            if profile.profile_id == profile_id:
+                return profile
+        return None
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return [profile.summary() for profile in reversed(list(self.profiles))]
+
+# Global instance
+request_profiler = RequestProfiler(
+    interval_ms=settings.profile_interval_ms,
+    capacity=settings.profile_buffer_size,
+    output_dir=settings.profile_dir
+)
@@ -0,0 +1,161 @@
+from core.config import settings
+from core.state import system_state
+from core.metrics import metrics_registry
+from typing import Dict, Tuple
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server, thread locks only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = metrics_registry.counter(
+    "klein_rate_limited_total", "Requests rejected by the per-client rate limiter", ["bucket"]
+)
+
+# key hash (0 = empty slot), tokens, last refill (monotonic seconds)
+_SLOT = struct.Struct("<Qdd")
+# Slots examined per lookup, starting at the key's home slot
+_PROBE = 8
+
+class TokenBucketTable:
+    """
+    Per-client token buckets in a fixed-size mmap table shared by every
+    uvicorn worker on the node.
+
+    The table is split into shards, each guarded by a thread lock plus a
+    byte-range file lock, so workers only contend when two clients hash to
+    the same shard. Keys are open-addressed within their shard over a short
+    probe window; when the window is full, an idle bucket (already refilled
+    to capacity, so nothing is lost) or else the least recently used one is
+    evicted. Memory stays fixed no matter how many client keys show up.
+    """
+
+    def __init__(self, path: str, shards: int, slots_per_shard: int):
+        self.path = path
+        self.shards = shards
+        self.slots_per_shard = slots_per_shard
+        self.shard_bytes = slots_per_shard * _SLOT.size
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+        size = shards * self.shard_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a+b")
+        if system_state.first_worker or os.fstat(self._file.fileno()).st_size != size:
+            # Fresh run (or resized table): start every client with a full bucket
+            self._file.truncate(0)
+            self._file.truncate(size)
+            self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def _hash(self, key: str) -> int:
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest or 1
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Spend `cost` tokens from key's bucket.
+
+        A request is admitted while the bucket holds at least one token; a
+        cost above one (a batch) can push the balance negative, which the
+        client then pays back before its next request is admitted.
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        key_hash = self._hash(key)
+        shard = key_hash % self.shards
+        home = (key_hash // self.shards) % self.slots_per_shard
+        base = shard * self.shard_bytes
+
+        with _ShardLock(self._locks[shard], self._file, base, self.shard_bytes):
+            now = time.monotonic()
+            victim, victim_score = -1, None
+            slot = -1
+            tokens, updated = float(burst), now
+
+            for i in range(min(_PROBE, self.slots_per_shard)):
+                index = (home + i) % self.slots_per_shard
+                slot_hash, slot_tokens, slot_updated = _SLOT.unpack_from(self._map, base + index * _SLOT.size)
+                if slot_hash == key_hash:
+                    slot = index
+                    tokens = min(float(burst), slot_tokens + (now - slot_updated) * rate)
+                    break
+
+                # Empty and idle slots are free; otherwise prefer the stalest one
+                idle = slot_hash == 0 or slot_tokens + (now - slot_updated) * rate >= burst
+                score = float("-inf") if idle else slot_updated
+                if victim_score is None or score < victim_score:
+                    victim, victim_score = index, score
+
+            if slot < 0:
+                slot = victim
+
+            if tokens >= 1.0:
+                allowed, retry_after = True, 0.0
+                tokens -= cost
+            else:
+                allowed, retry_after = False, (1.0 - tokens) / rate if rate > 0 else 60.0
+
+            _SLOT.pack_into(self._map, base + slot * _SLOT.size, key_hash, tokens, now)
+            return allowed, retry_after
+
+class _ShardLock:
+    """Thread lock plus an exclusive byte-range lock on one shard (where available)"""
+
+    def __init__(self, lock: threading.Lock, file, start: int, length: int):
+        self.lock = lock
+        self.file = file
+        self.start = start
+        self.length = length
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl:
+            fcntl.lockf(self.file.fileno(), fcntl.LOCK_EX, self.length, self.start)
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.lockf(self.file.fileno(), fcntl.LOCK_UN, self.length, self.start)
+        self.lock.release()
+
+class RateLimiter:
+    """Named token-bucket policies (chat, control) over one shared table"""
+
+    def __init__(self, enabled: bool, table: TokenBucketTable, policies: Dict[str, Tuple[float, float]]):
+        self.enabled = enabled
+        self.table = table
+        self.policies = policies
+
+    def check(self, bucket: str, client: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """(allowed, retry_after_seconds) for one request from `client`"""
+        if not self.enabled:
+            return True, 0.0
+
+        rate, burst = self.policies[bucket]
+        allowed, retry_after = self.table.take(f"{bucket}:{client}", rate, burst, cost)
+        if not allowed:
+            RATE_LIMITED.inc(bucket=bucket)
+        return allowed, retry_after
+
+# Global instance
+rate_limiter = RateLimiter(
+    enabled=settings.rate_limit_enabled,
+    table=TokenBucketTable(
+        os.path.join(settings.runtime_dir, "ratelimit.bin"),
+        shards=settings.rate_limit_shards,
+        slots_per_shard=settings.rate_limit_shard_slots
+    ),
+    policies={
+        "chat": (settings.rate_limit_chat_rate, settings.rate_limit_chat_burst),
+        "control": (settings.rate_limit_control_rate, settings.rate_limit_control_burst),
+    }
+)
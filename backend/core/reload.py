@@ -0,0 +1,130 @@
+from core.config import settings
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class ReloadableFile(Generic[T]):
+    """
+    A JSON data file compiled into an immutable snapshot.
+
+    `current` always holds a fully built snapshot; a reload builds the new one
+    on the watcher thread and swaps the reference in one assignment. Readers
+    take `current` once per request, so in-flight requests finish on the
+    snapshot they started with. A file that fails to parse or build is
+    rejected and the current snapshot keeps serving. Without a configured
+    path the bundled `default_path` is used.
+    """
+
+    def __init__(self, name: str, path: str, build: Callable[[Dict[str, Any]], T],
+                 default_path: Optional[str] = None):
+        self.name = name
+        self.path = path or default_path
+        if not self.path:
+            raise ValueError(f"No path configured for {name}")
+        if not path:
+            logger.warning(f"No path configured for {name}, using the bundled {self.path}")
+        self.build = build
+        self.generation = 0
+        self.version: Any = None
+        self.loaded_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+
+        # A bad file at startup is fatal, like any other config error
+        self.current: T = self._load()
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> T:
+        stamp = self._file_stamp()
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if not isinstance(raw, dict):
+            raise ValueError("top level must be a JSON object")
+
+        snapshot = self.build(raw)
+        self._stamp = stamp
+        self.generation += 1
+        self.version = raw.get("version")
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+        self.last_error = None
+        logger.info(f"Loaded {self.name} v{self.version} (generation {self.generation}) from {self.path}")
+        return snapshot
+
+    def replace(self, snapshot: T):
+        """Swap in an already built snapshot"""
+        self.current = snapshot
+
+    def check(self) -> bool:
+        """Reload if the file changed; True when a new snapshot was swapped in"""
+        try:
+            if self._file_stamp() == self._stamp:
+                return False
+            snapshot = self._load()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if error != self.last_error:
+                logger.error(f"Rejected {self.name} reload from {self.path}, keeping generation {self.generation}: {error}")
+            self.last_error = error
+            try:
+                # Don't retry the same broken file every poll
+                self._stamp = self._file_stamp()
+            except OSError:
+                pass
+            return False
+
+        self.replace(snapshot)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+            "path": self.path
+        }
+
+class ReloadWatcher:
+    """Polls every registered file on one background thread"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.files: List[ReloadableFile] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, name: str, path: str, build: Callable[[Dict[str, Any]], T],
+              default_path: Optional[str] = None) -> ReloadableFile[T]:
+        reloadable = ReloadableFile(name, path, build, default_path)
+        self.files.append(reloadable)
+        return reloadable
+
+    def start(self):
+        """Start polling (once per process; safe to call again after a fork)"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                for reloadable in list(self.files):
+                    reloadable.check()
+
+        self._thread = threading.Thread(target=run, name="reload-watcher", daemon=True)
+        self._thread.start()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {reloadable.name: reloadable.status() for reloadable in self.files}
+
+# Global instance
+reload_watcher = ReloadWatcher(interval=settings.reload_interval_s)
@@ -0,0 +1,244 @@
+from core.config import settings
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout below or the meaning of any section changes
+FORMAT_VERSION = 3
+MAGIC = b"KLEINSNP"
+
+# magic, format version, created_at (unix seconds), fingerprint, section count
+_HEADER = struct.Struct("<8sHd16sH")
+# section name, entry count, payload bytes, payload crc32
+_SECTION = struct.Struct("<16sIII")
+# expires_at (unix seconds), key bytes, value bytes; key and value follow
+_ENTRY = struct.Struct("<dHI")
+
+# (key, expires_at, value bytes); sections provide export() and restore(entries)
+Entry = Tuple[str, float, bytes]
+
+class SnapshotRejected(Exception):
+    """The snapshot file is unreadable, stale or from an incompatible build"""
+
+def build_fingerprint() -> bytes:
+    """Identifies the settings cached values depend on; any change invalidates a snapshot"""
+    parts = [
+        str(FORMAT_VERSION),
+        settings.app_version,
+        settings.vertex_model,
+        settings.elastic_endpoint,
+        settings.elastic_cloud_id,
+        str(settings.elastic_fragment_chars),
+        str(settings.elastic_fragments),
+        settings.context_budget_unit,
+        str(settings.context_budget_normal),
+        str(settings.context_budget_peak),
+    ]
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+
+class SnapshotStore:
+    """
+    Periodic binary snapshots of the hot in-memory caches, for warm restarts.
+
+    Each registered section (retrieval cache, answer cache, session memory)
+    is written as a checksummed block of length-prefixed entries behind a
+    versioned header. At startup the file is memory-mapped and every check
+    (magic, format version, settings fingerprint, age, section checksums)
+    must pass before anything is restored; otherwise the workers simply
+    start cold. Writes go to a temp file and are swapped in atomically, so
+    a crash mid-write never leaves a torn snapshot. Every worker writes its
+    own view and the latest write wins.
+
+    The file holds session transcripts, so it is created 0600 (its directory
+    0700 when created here), and a file owned by another user or writable by
+    others is refused rather than restored.
+    """
+
+    def __init__(self, path: str, interval: float, max_age_s: float, fingerprint: bytes):
+        self.path = path
+        self.interval = interval
+        self.max_age_s = max_age_s
+        self.fingerprint = fingerprint
+        self.sections: Dict[str, Any] = {}
+        self.last_write: Optional[float] = None
+        self.last_load: Dict[str, Any] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def register(self, name: str, section: Any):
+        if len(name.encode("utf-8")) > 16:
+            raise ValueError(f"Snapshot section name too long: {name}")
+        self.sections[name] = section
+
+    def write(self) -> bool:
+        """Write every section to the snapshot file; True on success"""
+        if not self.enabled:
+            return False
+
+        started = time.perf_counter()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            blocks = [(name, _encode(section.export())) for name, section in self.sections.items()]
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+            try:
+                os.remove(tmp_path)  # left behind by a crashed process with this pid
+            except FileNotFoundError:
+                pass
+            # Exclusive create never follows a planted file or symlink
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), self.fingerprint, len(blocks)))
+                for name, (count, payload) in blocks:
+                    f.write(_SECTION.pack(name.encode("utf-8"), count, len(payload), zlib.crc32(payload)))
+                    f.write(payload)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to write cache snapshot {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+        self.last_write = time.time()
+        logger.debug("Wrote cache snapshot %s in %.1fms", self.path, (time.perf_counter() - started) * 1000)
+        return True
+
+    def load(self) -> Dict[str, int]:
+        """
+        Restore every section from the snapshot file
+
+        Returns:
+            Dict[str, int]: Entries restored per section (empty when rejected or missing)
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return {}
+
+        try:
+            if os.path.getsize(self.path) < _HEADER.size:
+                raise SnapshotRejected("truncated header")
+            with open(self.path, "rb") as f:
+                _check_owner(os.fstat(f.fileno()))
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with view:
+                # Decode everything before restoring anything
+                decoded = {
+                    name: list(_decode(view, offset, count, length))
+                    for name, (offset, count, length) in self._parse(view).items()
+                    if name in self.sections
+                }
+            restored = {name: self.sections[name].restore(entries) for name, entries in decoded.items()}
+        except SnapshotRejected as e:
+            logger.warning(f"Ignoring cache snapshot {self.path}: {e}")
+            self.last_load = {"rejected": str(e)}
+            return {}
+        except Exception as e:
+            logger.error(f"Failed to restore cache snapshot {self.path}: {e}")
+            self.last_load = {"rejected": f"{type(e).__name__}: {e}"}
+            return {}
+
+        logger.info(f"Restored cache snapshot {self.path}: {restored}")
+        self.last_load = {"restored": restored}
+        return restored
+
+    def _parse(self, view: mmap.mmap) -> Dict[str, Tuple[int, int, int]]:
+        """Validate the whole file; returns section name -> (offset, entries, length)"""
+        if len(view) < _HEADER.size:
+            raise SnapshotRejected("truncated header")
+        magic, version, created_at, fingerprint, count = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise SnapshotRejected("not a snapshot file")
+        if version != FORMAT_VERSION:
+            raise SnapshotRejected(f"format version {version}, expected {FORMAT_VERSION}")
+        if fingerprint != self.fingerprint:
+            raise SnapshotRejected("written by a different build or configuration")
+        age = time.time() - created_at
+        if age > self.max_age_s:
+            raise SnapshotRejected(f"stale ({age:.0f}s old, max {self.max_age_s:.0f}s)")
+
+        sections = {}
+        offset = _HEADER.size
+        for _ in range(count):
+            if offset + _SECTION.size > len(view):
+                raise SnapshotRejected("truncated section header")
+            raw_name, entries, length, crc = _SECTION.unpack_from(view, offset)
+            name = raw_name.rstrip(b"\0").decode("utf-8", "replace")
+            offset += _SECTION.size
+            if offset + length > len(view) or zlib.crc32(view[offset:offset + length]) != crc:
+                raise SnapshotRejected(f"section {name} is corrupt")
+            sections[name] = (offset, entries, length)
+            offset += length
+        return sections
+
+    def start(self):
+        """Start periodic snapshots (once per worker)"""
+        if not self.enabled or self.interval <= 0 or self._thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                self.write()
+
+        self._thread = threading.Thread(target=run, name="cache-snapshot", daemon=True)
+        self._thread.start()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "last_write": self.last_write,
+            "last_load": self.last_load
+        }
+
+def _check_owner(stat: os.stat_result):
+    """Only restore a file this user wrote and nobody else can change"""
+    if not hasattr(os, "getuid"):  # no POSIX ownership (Windows)
+        return
+    if stat.st_uid != os.getuid():
+        raise SnapshotRejected(f"owned by uid {stat.st_uid}, not {os.getuid()}")
+    if stat.st_mode & 0o022:
+        raise SnapshotRejected(f"writable by other users (mode {stat.st_mode & 0o777:o})")
+
+def _encode(entries: List[Entry]) -> Tuple[int, bytes]:
+    parts = []
+    for key, expires_at, value in entries:
+        key_bytes = key.encode("utf-8")
+        if len(key_bytes) > 0xFFFF:
+            continue
+        parts.append(_ENTRY.pack(expires_at, len(key_bytes), len(value)))
+        parts.append(key_bytes)
+        parts.append(value)
+    return len(parts) // 3, b"".join(parts)
+
+def _decode(view: mmap.mmap, offset: int, count: int, length: int) -> Iterator[Entry]:
+    end = offset + length
+    for _ in range(count):
+        expires_at, key_len, value_len = _ENTRY.unpack_from(view, offset)
+        offset += _ENTRY.size
+        key = view[offset:offset + key_len].decode("utf-8")
+        offset += key_len
+        value = view[offset:offset + value_len]
+        offset += value_len
+        if offset > end or len(value) != value_len:
+            raise SnapshotRejected("entry overruns its section")
+        yield key, expires_at, value
+
+# Global instance; services register their caches at import time
+snapshot_store = SnapshotStore(
+    path=settings.snapshot_path,
+    interval=settings.snapshot_interval_s,
+    max_age_s=settings.snapshot_max_age_s,
+    fingerprint=build_fingerprint()
+)
@@ -0,0 +1,136 @@
+from core.config import settings
+from typing import Optional, Tuple
+import mmap
+import os
+import struct
+import threading
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server, thread lock only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ENERGY_MODES = ("normal", "peak")
+
+# version (seqlock counter), accept_requests flag, energy mode index, draining flag
+_LAYOUT = struct.Struct("<QBBB")
+_VERSION = struct.Struct("<Q")
+_SIZE = 64
+
+class SharedState:
+    """
+    System control state shared by every uvicorn worker on the node.
+
+    The state lives in a small mmap-backed file. Writers take a file lock and
+    bump a seqlock version around each update; readers never lock, they just
+    retry if they raced a writer. A mode change or shutdown made on one worker
+    is visible to all others on their next read.
+
+    Every live worker holds a shared lock on a presence file; the first worker
+    to start after all others have exited resets the state, so a restart
+    never inherits a previous run's shutdown.
+    """
+
+    def __init__(self, path: str, energy_mode: str = "normal"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._presence = open(path + ".lock", "a+b")
+        first_worker = self._claim_presence()
+        self.first_worker = first_worker
+
+        self._file = open(path, "a+b")
+        with self._file_lock():
+            if os.fstat(self._file.fileno()).st_size < _SIZE:
+                self._file.truncate(_SIZE)
+                self._file.flush()
+                first_worker = True
+            self._map = mmap.mmap(self._file.fileno(), _SIZE)
+            if first_worker:
+                version = _VERSION.unpack_from(self._map, 0)[0] & ~1
+                _LAYOUT.pack_into(self._map, 0, version + 2, 1, self._mode_index(energy_mode), 0)
+                logger.info(f"Initialized shared system state at {path}")
+
+    def _claim_presence(self) -> bool:
+        """Hold a shared presence lock; True if no other worker was alive"""
+        if not fcntl:
+            return True
+        try:
+            fcntl.flock(self._presence.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            first_worker = True
+        except OSError:
+            first_worker = False
+        fcntl.flock(self._presence.fileno(), fcntl.LOCK_SH)
+        return first_worker
+
+    def _file_lock(self):
+        return _FileLock(self._file, self._lock)
+
+    def _mode_index(self, mode: str) -> int:
+        return ENERGY_MODES.index(mode) if mode in ENERGY_MODES else 0
+
+    def _read(self) -> Tuple[int, int, int, int]:
+        while True:
+            fields = _LAYOUT.unpack_from(self._map, 0)
+            if not fields[0] & 1 and _VERSION.unpack_from(self._map, 0)[0] == fields[0]:
+                return fields
+
+    def read(self) -> Tuple[int, bool, str]:
+        """Lock-free consistent read of (version, accept_requests, energy_mode)"""
+        version, accept, mode, _ = self._read()
+        return version, bool(accept), ENERGY_MODES[mode]
+
+    @property
+    def accept_requests(self) -> bool:
+        return self.read()[1]
+
+    @property
+    def energy_mode(self) -> str:
+        return self.read()[2]
+
+    @property
+    def draining(self) -> bool:
+        """A shutdown is waiting for in-flight requests; new work is refused"""
+        return bool(self._read()[3])
+
+    def update(self, accept_requests: Optional[bool] = None, energy_mode: Optional[str] = None,
+               draining: Optional[bool] = None) -> int:
+        """Atomically update any of the fields; returns the new version"""
+        with self._file_lock():
+            version, accept, mode, drain = _LAYOUT.unpack_from(self._map, 0)
+            if accept_requests is not None:
+                accept = int(accept_requests)
+            if energy_mode is not None:
+                mode = self._mode_index(energy_mode)
+            if draining is not None:
+                drain = int(draining)
+
+            # Odd version marks the write in progress for concurrent readers
+            _VERSION.pack_into(self._map, 0, version + 1)
+            _LAYOUT.pack_into(self._map, 0, version + 1, accept, mode, drain)
+            _VERSION.pack_into(self._map, 0, version + 2)
+            return version + 2
+
+class _FileLock:
+    """Thread lock plus an exclusive flock on the state file (where available)"""
+
+    def __init__(self, file, lock: threading.Lock):
+        self.file = file
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.lock.release()
+
+# Global instance
+system_state = SharedState(os.path.join(settings.runtime_dir, "system-state.bin"), settings.energy_mode)
@@ -0,0 +1,186 @@
+from core.config import settings
+from contextvars import ContextVar
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+import random
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """One timed step of a trace"""
+    __slots__ = ("name", "parent", "start", "end", "attributes")
+
+    def __init__(self, name: str, parent: int, start: float, attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.start = start
+        self.end = start
+        self.attributes = attributes
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+class Trace:
+    """All spans recorded for one request"""
+    __slots__ = ("trace_id", "name", "started_at", "start", "end", "spans", "stack", "keep")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.start = time.perf_counter()
+        self.end = self.start
+        self.spans = [Span(name, -1, self.start, attributes)]
+        self.stack = [0]
+        self.keep = False
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def set(self, key: str, value: Any):
+        self.root.attributes[key] = value
+
+    def mark(self):
+        """Always keep this trace, regardless of latency or sampling"""
+        self.keep = True
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.root.attributes,
+            "spans": [
+                {
+                    "name": span.name,
+                    "parent": span.parent,
+                    "offset_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round((span.end - span.start) * 1000, 3),
+                    "attributes": span.attributes
+                }
+                for span in self.spans[1:]
+            ]
+        }
+
+class _NoopSpan:
+    """Returned when no trace is active; every operation is free"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def mark(self):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class _SpanContext:
+    __slots__ = ("trace", "span")
+
+    def __init__(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span = Span(name, trace.stack[-1], 0.0, attributes)
+
+    def __enter__(self) -> Span:
+        self.span.start = time.perf_counter()
+        self.trace.spans.append(self.span)
+        self.trace.stack.append(len(self.trace.spans) - 1)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.attributes["error"] = exc_type.__name__
+        self.trace.stack.pop()
+        return False
+
+class _TraceContext:
+    __slots__ = ("tracer", "trace", "token")
+
+    def __init__(self, tracer: "Tracer", trace: Trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self) -> Trace:
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self.token)
+        self.trace.end = self.trace.root.end = time.perf_counter()
+        if exc_type is not None:
+            self.trace.root.attributes["error"] = exc_type.__name__
+            self.trace.keep = True
+        self.tracer._finish(self.trace)
+        return False
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("klein_trace", default=None)
+
+class Tracer:
+    """
+    Request tracing into an in-memory ring buffer.
+
+    Sampling is tail-based: a finished trace is kept when it was slow,
+    was marked (flagged/denied/errored), or wins the random sample.
+    When tracing is disabled no trace is ever started and every span()
+    call returns a shared no-op.
+    """
+
+    def __init__(self, enabled: bool, capacity: int = 200, slow_ms: float = 500.0, sample_rate: float = 0.0):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.buffer: deque = deque(maxlen=capacity)
+
+    def trace(self, name: str, **attributes: Any):
+        """Start a trace for one request (no-op when tracing is disabled)"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _TraceContext(self, Trace(name, attributes))
+
+    def span(self, name: str, **attributes: Any):
+        """Time a step of the current trace (no-op outside a trace)"""
+        trace = _current_trace.get()
+        if trace is None:
+            return _NOOP_SPAN
+        return _SpanContext(trace, name, attributes)
+
+    def current(self) -> Optional[Trace]:
+        return _current_trace.get()
+
+    def _finish(self, trace: Trace):
+        if trace.keep or trace.duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+            self.buffer.append(trace)
+
+    def recent(self, limit: int = 50, min_ms: float = 0.0) -> List[Dict[str, Any]]:
+        """Most recent kept traces, newest first"""
+        traces = []
+        for trace in reversed(list(self.buffer)):
+            if trace.duration_ms >= min_ms:
+                traces.append(trace.to_dict())
+                if len(traces) >= limit:
+                    break
+        return traces
+
+# Global instance
+tracer = Tracer(
+    enabled=settings.trace_enabled,
+    capacity=settings.trace_buffer_size,
+    slow_ms=settings.trace_slow_ms,
+    sample_rate=settings.trace_sample_rate
+)
@@ -1,14 +1,23 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
 class ChatRequest(BaseModel):
     message: str
-    lang: str = "en"
+    lang: Optional[str] = None  # "en", "fr", "ht"; detected from the message when omitted
+    session_id: Optional[str] = Field(None, max_length=128)  # Enables conversation memory
 
 class ChatResponse(BaseModel):
     answer: str
     status: str  # "SAFE", "FLAGGED", "DENIED"
     audit_id: Optional[str] = None
+    lang: Optional[str] = None  # Language the request was processed in
+    session_id: Optional[str] = None
+
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest]
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatResponse]
 
 class ModeRequest(BaseModel):
     mode: str  # "normal", "peak"
@@ -22,6 +31,7 @@ class ShutdownResponse(BaseModel):
     ok: bool
     message: str
     audit_id: str
+    drain: Optional[Dict[str, Any]] = None
 
 class HealthResponse(BaseModel):
     ok: bool
@@ -29,3 +39,8 @@ class HealthResponse(BaseModel):
     mode: str
     timestamp: str
     services: Dict[str, str]
+    checks: Optional[Dict[str, Any]] = None
+    event_loop: Optional[Dict[str, float]] = None
+    executor: Optional[Dict[str, Any]] = None
+    data_files: Optional[Dict[str, Any]] = None
+    in_flight: Optional[int] = None
@@ -1,80 +1,127 @@
-from fastapi import APIRouter, HTTPException
-from models.schemas import ChatRequest, ChatResponse
-from services.klein import klein_service
-from services.ophir import ophir_service
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from models.schemas import ChatRequest, ChatResponse, ChatBatchRequest, ChatBatchResponse
+from services.pipeline import chat_pipeline
+from services.query import QueryContext
+from core.config import settings
+from core.state import system_state
+from core.metrics import CHAT_REQUESTS
+from core.profiling import request_profiler, PROFILE_HEADER
+from core.executor import stage_executor, ExecutorSaturated
+from routers.dependencies import client_identity, rate_limit, enforce_rate_limit, track_in_flight
+from routers.wire import parse_body, render, request_body
+from typing import Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+def _overloaded(e: ExecutorSaturated) -> HTTPException:
+    logger.warning(f"Shedding chat request: {e}")
+    return HTTPException(
+        status_code=503,
+        detail="System is busy right now. Please try again in a moment.",
+        headers={"Retry-After": "1"}
+    )
+
+@router.post("/chat", response_model=ChatResponse, openapi_extra=request_body(ChatRequest),
+             dependencies=[Depends(track_in_flight), Depends(rate_limit("chat"))])
+async def chat_endpoint(http_request: Request) -> Response:
     """
     Main chat endpoint - Klein generates response, Ophir provides oversight
+    Accepts and returns JSON or MessagePack (Content-Type / Accept)
     """
+    request = await parse_body(http_request, ChatRequest)
+    result, profile_id = await _chat(request, http_request)
+
+    response = render(result, http_request)
+    if profile_id:
+        response.headers["X-Klein-Profile-Id"] = profile_id
+    return response
+
+async def _chat(request: ChatRequest, http_request: Request) -> Tuple[ChatResponse, Optional[str]]:
+    """Run one chat request; returns the response and the profile ID if one was captured"""
+    # Normalized once here and shared by every stage, including the fallback
+    query = QueryContext.from_request(request)
+    # Conversation memory is per client: a session_id only reaches its own history
+    owner = client_identity(http_request)
+    # Label for a fallback raised before the shared state is read
+    energy_mode = settings.energy_mode
     try:
-        logger.info(f"Chat request received: {request.message}")
+        logger.info("Chat request received: %d chars", len(request.message))
+        logger.debug("Chat message: %.200s", request.message)
 
         # Check if system is accepting requests (shutdown compliance)
-        from app import ACCEPT_REQUESTS, ENERGY_MODE
+        _, accept_requests, energy_mode = system_state.read()
 
-        if not ACCEPT_REQUESTS:
+        if not accept_requests:
+            CHAT_REQUESTS.inc(status="DENIED", mode=energy_mode)
             return ChatResponse(
                 answer="System is currently shut down for maintenance. Please try again later.",
-                status="DENIED"
-            )
-
-        # Klein generates initial response
-        klein_response = klein_service.get_klein_response(
-            request.message,
-            mode=ENERGY_MODE
-        )
-
-        logger.info(f"Klein response: {klein_response[:100]}...")
-
-        # Ophir evaluates and potentially modifies the response
-        status, final_response = ophir_service.evaluate_response(
-            request.message,
-            klein_response
-        )
-
-        logger.info(f"Final response status: {status}")
-
-        return ChatResponse(
-            answer=final_response,
-            status=status
-        )
-
+                status="DENIED",
+                lang=query.lang,
+                session_id=request.session_id
+            ), None
+
+        # Opt-in profiling; requests without the header skip this entirely
+        profile_token = http_request.headers.get(PROFILE_HEADER)
+        if profile_token and request_profiler.authorized(profile_token):
+            def profiled_run():
+                # Whole pipeline on one stage thread so the sampler sees it
+                with request_profiler.profile(f"chat mode={energy_mode}") as profile:
+                    return chat_pipeline.run(request, mode=energy_mode, query=query, owner=owner), profile
+
+            result, profile = await stage_executor.run("profile", profiled_run)
+            return result, profile.profile_id
+
+        return await chat_pipeline.run_async(request, mode=energy_mode, query=query, owner=owner), None
+
+    except ExecutorSaturated as e:
+        raise _overloaded(e)
     except Exception as e:
         logger.error(f"Chat endpoint error: {e}", exc_info=True)
+        return chat_pipeline.fallback(request, query, energy_mode), None
+
+@router.post("/chat/batch", response_model=ChatBatchResponse, openapi_extra=request_body(ChatBatchRequest),
+             dependencies=[Depends(track_in_flight)])
+async def chat_batch_endpoint(http_request: Request) -> Response:
+    """
+    Batch chat endpoint - one call for many messages, each with its own status
+    Accepts and returns JSON or MessagePack (Content-Type / Accept)
+    """
+    batch = await parse_body(http_request, ChatBatchRequest)
+    return render(await _chat_batch(batch, http_request), http_request)
+
+async def _chat_batch(batch: ChatBatchRequest, http_request: Request) -> ChatBatchResponse:
+    if len(batch.requests) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.requests)} messages (max {settings.batch_max_items})"
+        )
 
-        # Direct fallback responses for demo scenarios
-        query_lower = request.message.lower()
+    # Each message costs one chat token
+    enforce_rate_limit("chat", http_request, cost=len(batch.requests))
 
-        # Handle weather query directly
-        if "weather" in query_lower and "port-au-prince" in query_lower:
-            return ChatResponse(
-                answer="Klein: Port-au-Prince typically experiences tropical weather with temperatures around 25-30°C (77-86°F). During hurricane season (June-November), expect afternoon thunderstorms. Please monitor local weather services for current conditions.",
-                status="SAFE"
-            )
+    logger.info("Chat batch received: %d messages", len(batch.requests))
 
-        # Handle restricted query
-        if "classified" in query_lower or "navy" in query_lower:
-            return ChatResponse(
-                answer="⚠️ This request may contain restricted or sensitive information. Please refine your question to focus on publicly available information.",
-                status="FLAGGED"
-            )
+    _, accept_requests, energy_mode = system_state.read()
 
-        # Handle empathy query
-        if any(word in query_lower for word in ["overwhelmed", "stressed", "anxious", "help"]):
-            return ChatResponse(
-                answer="Klein: I understand you're going through a difficult time. It's completely normal to feel overwhelmed sometimes. Take a moment to breathe, and remember that you don't have to face this alone. Would you like to talk about what's causing these feelings?",
-                status="SAFE"
+    if not accept_requests:
+        CHAT_REQUESTS.inc(len(batch.requests), status="DENIED", mode=energy_mode)
+        return ChatBatchResponse(results=[
+            ChatResponse(
+                answer="System is currently shut down for maintenance. Please try again later.",
+                status="DENIED",
+                lang=QueryContext.from_request(request).lang,
+                session_id=request.session_id
             )
-
-        # General fallback
-        return ChatResponse(
-            answer=f"Klein: I'd be happy to help you with '{request.message}'. While I'm experiencing some technical difficulties, I can still provide general assistance and guidance on this topic.",
-            status="SAFE"
-        )
+            for request in batch.requests
+        ])
+
+    results = await chat_pipeline.run_batch(
+        batch.requests,
+        mode=energy_mode,
+        concurrency=settings.batch_concurrency,
+        owner=client_identity(http_request)
+    )
+    return ChatBatchResponse(results=results)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response
 from models.schemas import HealthResponse, ModeRequest, ModeResponse, ShutdownResponse
-from services.ophir import ophir_service
 from services.audit import audit_service
+from services.health import health_prober
+from core.state import system_state, ENERGY_MODES
+from core.executor import stage_executor, loop_monitor
+from core.reload import reload_watcher
+from core.drain import drain_controller
+from routers.dependencies import rate_limit
 from datetime import datetime, timezone
 import logging
 
@@ -10,45 +15,47 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check():
-    """System health check endpoint"""
-    from app import ACCEPT_REQUESTS, ENERGY_MODE
+async def health_check(response: Response):
+    """System health check endpoint (served from cached background probes)"""
+    _, accept_requests, energy_mode = system_state.read()
 
-    ophir_health = ophir_service.check_system_health()
+    if not drain_controller.accepting:
+        # Not ready: load balancers should stop routing here
+        status = "draining"
+        response.status_code = 503
+    else:
+        status = "running" if accept_requests else "shutdown"
 
     return HealthResponse(
-        ok=True,
-        status="running" if ACCEPT_REQUESTS else "shutdown",
-        mode=ENERGY_MODE,
+        ok=status != "draining",
+        status=status,
+        mode=energy_mode,
         timestamp=datetime.now(timezone.utc).isoformat(),
-        services={
-            "klein": "operational",
-            "ophir": ophir_health["status"],
-            "retrieval": "operational",
-            "audit": "operational"
-        }
+        services=health_prober.services(),
+        checks=health_prober.checks(),
+        event_loop=loop_monitor.status(),
+        executor=stage_executor.status(),
+        data_files=reload_watcher.status(),
+        in_flight=drain_controller.in_flight
     )
 
-@router.post("/mode", response_model=ModeResponse)
+@router.post("/mode", response_model=ModeResponse, dependencies=[Depends(rate_limit("control"))])
 async def set_energy_mode(request: ModeRequest):
     """Set system energy mode (normal/peak)"""
-    from app import ENERGY_MODE
-    import app
-
-    valid_modes = ["normal", "peak"]
+    valid_modes = list(ENERGY_MODES)
+    old_mode = system_state.energy_mode
 
     if request.mode not in valid_modes:
         return ModeResponse(
             ok=False,
-            mode=ENERGY_MODE,
+            mode=old_mode,
             message=f"Invalid mode. Valid modes: {valid_modes}"
         )
 
-    old_mode = ENERGY_MODE
-    app.ENERGY_MODE = request.mode
+    system_state.update(energy_mode=request.mode)
 
     # Log the mode change
-    audit_service.log_mode_change(old_mode, request.mode)
+    await stage_executor.run("audit", audit_service.log_mode_change, old_mode, request.mode)
 
     return ModeResponse(
         ok=True,
@@ -56,11 +63,10 @@ async def set_energy_mode(request: ModeRequest):
         message=f"Energy mode changed from {old_mode} to {request.mode}"
     )
 
-@router.post("/shutdown", response_model=ShutdownResponse)
+@router.post("/shutdown", response_model=ShutdownResponse, dependencies=[Depends(rate_limit("control"))])
 async def shutdown_system():
     """Graceful system shutdown with audit compliance"""
     from core.config import settings
-    import app
 
     if not settings.allow_shutdown:
         return ShutdownResponse(
@@ -70,18 +76,31 @@ async def shutdown_system():
         )
 
     # Log shutdown request
-    audit_id = audit_service.log_shutdown({
+    audit_id = await stage_executor.run("audit", audit_service.log_shutdown, {
         "source": "api_endpoint",
         "message": "Shutdown requested via API"
     })
 
-    # Set system to not accept new requests
-    app.ACCEPT_REQUESTS = False
+    # Refuse new work on every worker, let this worker's in-flight requests finish, then stop accepting
+    system_state.update(draining=True)
+    try:
+        outcome = await drain_controller.drain(settings.drain_timeout_s, reason="api_shutdown")
+    finally:
+        system_state.update(accept_requests=False, draining=False)
+
+    await stage_executor.run("audit", audit_service.log_event, "SHUTDOWN_DRAIN", outcome)
 
     logger.info(f"System shutdown initiated - Audit ID: {audit_id}")
 
+    # The drain only covers the worker that served this request
+    if outcome["drained"]:
+        message = "System shutdown complete. New requests are refused on every worker and this worker's in-flight requests finished. All requests logged for audit compliance."
+    else:
+        message = f"System shutdown complete after {settings.drain_timeout_s}s drain deadline; {outcome['requests_remaining']} requests were still running on this worker."
+
     return ShutdownResponse(
         ok=True,
-        message="System shutdown complete. All requests logged for audit compliance.",
-        audit_id=audit_id
+        message=message,
+        audit_id=audit_id,
+        drain=outcome
     )
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from core.config import settings
+from core.tracing import tracer
+from core.profiling import request_profiler
+from typing import Optional
+import hmac
+import logging
+
+logger = logging.getLogger(__name__)
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """Debug endpoints need DEBUG_TOKEN configured and sent as X-Debug-Token"""
+    if not settings.debug_token:
+        raise HTTPException(status_code=404, detail="Debug endpoints are disabled")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token.encode("utf-8"), settings.debug_token.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+router = APIRouter(dependencies=[Depends(require_debug_token)])
+
+@router.get("/debug/traces")
+async def get_traces(limit: int = 50, min_ms: float = 0.0):
+    """Recent kept traces (slow, flagged or sampled), newest first"""
+    return {
+        "enabled": tracer.enabled,
+        "slow_ms": tracer.slow_ms,
+        "sample_rate": tracer.sample_rate,
+        "traces": tracer.recent(limit=limit, min_ms=min_ms)
+    }
+
+@router.get("/debug/profiles")
+async def list_profiles():
+    """Recently captured request profiles, newest first"""
+    return {"profiles": request_profiler.recent()}
+
+@router.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """One profile in collapsed-stack format (feed to flamegraph.pl or speedscope)"""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed())
@@ -0,0 +1,57 @@
+from fastapi import HTTPException, Request
+from core.config import settings
+from core.ratelimit import rate_limiter
+from core.drain import drain_controller
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+def client_identity(request: Request) -> str:
+    """Rate-limit key for the caller, per RATE_LIMIT_KEY (falls back to the IP)"""
+    key_source = settings.rate_limit_key
+    if key_source == "api_key":
+        authorization = request.headers.get("authorization", "")
+        api_key = request.headers.get("x-api-key") or (
+            authorization[7:] if authorization.lower().startswith("bearer ") else ""
+        )
+        if api_key:
+            return f"key:{api_key}"
+    elif key_source.startswith("header:"):
+        value = request.headers.get(key_source[len("header:"):])
+        if value:
+            return f"header:{value}"
+
+    if settings.rate_limit_trust_forwarded:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # The proxy appends the peer it saw; earlier entries are client-supplied
+            return f"ip:{forwarded.split(',')[-1].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def enforce_rate_limit(bucket: str, request: Request, cost: float = 1.0):
+    """Raise 429 with Retry-After when the caller's bucket is empty"""
+    allowed, retry_after = rate_limiter.check(bucket, client_identity(request), cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests. Please slow down.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+async def track_in_flight():
+    """Count the request as in flight; refuse it with 503 while draining"""
+    if not drain_controller.accepting:
+        raise HTTPException(
+            status_code=503,
+            detail="System is shutting down. Please retry shortly.",
+            headers={"Retry-After": "5", "Connection": "close"}
+        )
+    with drain_controller.track():
+        yield
+
+def rate_limit(bucket: str):
+    """Dependency that charges one token from `bucket` before the endpoint runs"""
+    async def dependency(request: Request):
+        enforce_rate_limit(bucket, request)
+    return dependency
@@ -0,0 +1,88 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, Type, TypeVar
+import logging
+
+try:
+    import msgpack
+except ImportError:  # Optional: without it the chat endpoints speak JSON only
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+def _media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+def _is_json(media_type: str) -> bool:
+    """
+    JSON, a +json type, or no Content-Type at all, as FastAPI accepts for a
+    declared body. Anything else is refused so form and text/plain posts,
+    which browsers send cross-site without a preflight, never reach a handler.
+    """
+    return media_type in ("", JSON_MEDIA_TYPE) or (media_type.startswith("application/") and media_type.endswith("+json"))
+
+def request_body(model: Type[BaseModel]) -> Dict[str, Any]:
+    """openapi_extra documenting a body read by parse_body() in both encodings"""
+    schema = model.model_json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {JSON_MEDIA_TYPE: {"schema": schema}, MSGPACK_MEDIA_TYPE: {"schema": schema}}
+        }
+    }
+
+async def parse_body(request: Request, model: Type[M]) -> M:
+    """
+    Validate the request body as `model`, decoding JSON or MessagePack by Content-Type
+
+    Raises:
+        RequestValidationError: The body does not match the model (422, like a declared body)
+        HTTPException: 415 for a Content-Type other than JSON or MessagePack (or MessagePack
+            without msgpack installed), 400 for an undecodable body
+    """
+    media_type = _media_type(request.headers.get("content-type", ""))
+    if media_type not in MSGPACK_MEDIA_TYPES and not _is_json(media_type):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type '{media_type}'")
+
+    body = await request.body()
+    try:
+        if media_type in MSGPACK_MEDIA_TYPES:
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="MessagePack is not supported by this server")
+            try:
+                data = msgpack.unpackb(body, raw=False)
+            except Exception:
+                raise HTTPException(status_code=400, detail="Malformed MessagePack body")
+            return model.model_validate(data)
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)],
+            body=body
+        )
+
+def wants_msgpack(request: Request) -> bool:
+    """MessagePack when the client asks for it, or sent it and accepts anything"""
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    if any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return True
+    return accept in ("", "*/*") and _media_type(request.headers.get("content-type", "")) in MSGPACK_MEDIA_TYPES
+
+def render(model: BaseModel, request: Request) -> Response:
+    """
+    Serialize an already validated response model in the negotiated encoding.
+    Returning a Response skips FastAPI's response_model re-validation and
+    jsonable_encoder pass; the model is dumped once.
+    """
+    if wants_msgpack(request):
+        return Response(msgpack.packb(model.model_dump(), use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE)
+    return Response(model.model_dump_json(), media_type=JSON_MEDIA_TYPE)
@@ -2,6 +2,8 @@ import json
 import uuid
 from datetime import datetime, timezone
 from typing import List, Dict, Any
+from core.metrics import AUDIT_WRITE_SECONDS
+from core.tracing import tracer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,8 +37,9 @@ class AuditService:
         }
 
         try:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(event_record) + "\n")
+            with AUDIT_WRITE_SECONDS.time(service="audit"), tracer.span("audit.write", event_type=event_type):
+                with open(self.log_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event_record) + "\n")
 
             logger.info(f"Audit event logged: {event_type} - {event_id}")
 
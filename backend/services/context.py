@@ -0,0 +1,107 @@
+from core.config import settings
+from dataclasses import dataclass
+from typing import List, Any, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT = "No specific context found."
+
+# Rough characters-per-token ratio used when budgets are expressed in tokens
+CHARS_PER_TOKEN = 4
+
+@dataclass
+class PackedContext:
+    """Context text packed into a budget, plus how much of the budget was used"""
+    text: str
+    budget: int
+    chars_used: int = 0
+    docs_used: int = 0
+    truncated: bool = False
+
+    @property
+    def empty(self) -> bool:
+        return self.docs_used == 0
+
+class ContextPacker:
+    """
+    Fills a per-energy-mode context budget from ranked passages.
+    Passages are consumed in rank order and packing stops as soon as the
+    budget is full, so lower-ranked documents are never read or copied.
+    """
+
+    def __init__(self):
+        self.budgets = {
+            "normal": self._to_chars(settings.context_budget_normal),
+            "peak": self._to_chars(settings.context_budget_peak),
+        }
+
+    def _to_chars(self, budget: int) -> int:
+        if settings.context_budget_unit == "tokens":
+            return budget * CHARS_PER_TOKEN
+        return budget
+
+    def budget_for(self, mode: str) -> int:
+        """Character budget for an energy mode"""
+        return self.budgets.get(mode, self.budgets["normal"])
+
+    def pack(self, docs: Iterable[Any], mode: str = "normal",
+             header: str = "Source: {source}\n", separator: str = "\n\n",
+             default_source: str = "Unknown") -> PackedContext:
+        """
+        Pack ranked documents into the budget for `mode`
+
+        Args:
+            docs: Retrieved passages (title, content, source), best first
+            mode: Energy mode selecting the budget
+            header: Per-document prefix; may use {n} (1-based rank) and {source}
+            separator: Text placed between documents
+
+        Returns:
+            PackedContext: Packed text and budget usage
+        """
+        budget = self.budget_for(mode)
+        parts: List[str] = []
+        used = 0
+        truncated = False
+
+        for doc in docs:
+            content = doc.content
+            if not content:
+                continue
+
+            prefix = header.format(n=len(parts) + 1, source=doc.source or default_source)
+            overhead = len(prefix) + (len(separator) if parts else 0)
+            room = budget - used - overhead
+            if room <= 0:
+                truncated = True
+                break
+
+            if len(content) > room:
+                # Copy only the slice that fits, then stop
+                parts.append(prefix + content[:room])
+                used += overhead + room
+                truncated = True
+                break
+
+            parts.append(prefix + content)
+            used += overhead + len(content)
+
+        if not parts:
+            return PackedContext(text=NO_CONTEXT, budget=budget, truncated=truncated)
+
+        packed = PackedContext(
+            text=separator.join(parts),
+            budget=budget,
+            chars_used=used,
+            docs_used=len(parts),
+            truncated=truncated
+        )
+        logger.debug(
+            "Packed context: %d/%d chars from %d docs (mode=%s, truncated=%s)",
+            packed.chars_used, budget, packed.docs_used, mode, truncated
+        )
+        return packed
+
+# Global instance
+context_packer = ContextPacker()
@@ -0,0 +1,147 @@
+from core.config import settings
+from services.retrieval import retrieval_service
+from services.ophir import ophir_service
+from services.audit import audit_service
+from services.vertex import vertex_client
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Optional, Tuple
+import asyncio
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ProbeResult:
+    """Latest outcome of one dependency probe"""
+    __slots__ = ("status", "latency_ms", "last_error", "checked_at", "details")
+
+    def __init__(self, status: str = "unknown", latency_ms: Optional[float] = None,
+                 last_error: Optional[str] = None, checked_at: Optional[str] = None,
+                 details: Optional[Dict[str, Any]] = None):
+        self.status = status
+        self.latency_ms = latency_ms
+        self.last_error = last_error
+        self.checked_at = checked_at
+        self.details = details or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "latency_ms": self.latency_ms,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            **self.details
+        }
+
+class HealthProber:
+    """
+    Probes Klein's dependencies on a schedule and caches the results.
+    /api/health reads the cache, so health checks cost nothing per hit
+    while still reporting what the last real probe saw.
+    """
+
+    def __init__(self, interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.probes: Dict[str, Callable[[], Tuple[str, Dict[str, Any]]]] = {
+            "klein": self._probe_vertex,
+            "ophir": self._probe_ophir,
+            "retrieval": self._probe_elastic,
+            "audit": self._probe_audit,
+        }
+        # Klein and retrieval fall back to stubs / local docs, so their
+        # dependency failing degrades the service rather than taking it down
+        self.failure_status = {"klein": "degraded", "retrieval": "degraded"}
+        self.results: Dict[str, ProbeResult] = {name: ProbeResult() for name in self.probes}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    async def probe_all(self):
+        await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+
+    async def _probe(self, name: str, probe: Callable[[], Tuple[str, Dict[str, Any]]]):
+        previous = self.results[name]
+        started = time.perf_counter()
+        try:
+            status, details = await asyncio.wait_for(asyncio.to_thread(probe), self.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            status, details, error = self.failure_status.get(name, "down"), {}, f"probe timed out after {self.timeout}s"
+        except Exception as e:
+            status, details, error = self.failure_status.get(name, "down"), {}, str(e)
+
+        if error:
+            logger.warning(f"Health probe {name} failed: {error}")
+
+        self.results[name] = ProbeResult(
+            status=status,
+            latency_ms=round((time.perf_counter() - started) * 1000, 3),
+            last_error=error or (previous.last_error if status != "operational" else None),
+            checked_at=datetime.now(timezone.utc).isoformat(),
+            details=details
+        )
+
+    def _probe_vertex(self) -> Tuple[str, Dict[str, Any]]:
+        if not vertex_client.configured:
+            return "operational", {"backend": "stub"}
+        if not vertex_client.live:
+            return "operational", {"backend": "vertex", "generate": False}
+
+        import httpx
+
+        vertex_client.access_token()
+        # Any HTTP answer means the regional endpoint is reachable
+        httpx.get(vertex_client.base_url, timeout=self.timeout)
+        return "operational", {
+            "backend": "vertex",
+            "hedging": vertex_client.hedger.status(),
+            "prompt_cache": vertex_client.prompt_cache.status()
+        }
+
+    def _probe_ophir(self) -> Tuple[str, Dict[str, Any]]:
+        health = ophir_service.check_system_health()
+        return health["status"], {"restrictions_active": health["restrictions_active"]}
+
+    def _probe_elastic(self) -> Tuple[str, Dict[str, Any]]:
+        client = retrieval_service.es_client
+        if client is None:
+            return "operational", {"backend": "local"}
+
+        client = client.options(request_timeout=self.timeout, max_retries=0)
+        if not client.ping():
+            raise ConnectionError("Elasticsearch ping failed")
+        if not client.indices.exists(index=retrieval_service.index_name):
+            # Searches fall back to local documents, so this degrades rather than fails
+            return "degraded", {"backend": "elastic", "index": retrieval_service.index_name, "index_exists": False}
+        return "operational", {"backend": "elastic", "index": retrieval_service.index_name, "index_exists": True}
+
+    def _probe_audit(self) -> Tuple[str, Dict[str, Any]]:
+        log_dir = os.path.dirname(os.path.abspath(audit_service.log_file))
+        if os.path.exists(audit_service.log_file):
+            writable = os.access(audit_service.log_file, os.W_OK)
+        else:
+            writable = os.access(log_dir, os.W_OK)
+        if not writable:
+            raise PermissionError(f"Audit log {audit_service.log_file} is not writable")
+        return "operational", {"log_file": audit_service.log_file}
+
+    def services(self) -> Dict[str, str]:
+        return {name: result.status for name, result in self.results.items()}
+
+    def checks(self) -> Dict[str, Any]:
+        return {name: result.to_dict() for name, result in self.results.items()}
+
+# Global instance
+health_prober = HealthProber(
+    interval=settings.health_probe_interval_s,
+    timeout=settings.health_probe_timeout_s
+)
@@ -0,0 +1,181 @@
+from core.config import settings
+from services.language import fold
+from typing import List, Dict, Any, Iterable, Optional, Set
+import bisect
+import json
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+class KeywordMatcher:
+    """
+    Single-pass substring matcher over a fixed keyword set.
+    Keywords are compiled into one trie-shaped regex, so scanning a text
+    costs roughly one pass regardless of how many keywords are loaded.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+
+        # A keyword that contains another one hides it when both start at the
+        # same position, so each keyword also reports the keywords inside it
+        self._implied = {
+            k: [other for other in self.keywords if other != k and other in k]
+            for k in self.keywords
+        }
+
+        if self.keywords:
+            trie: Dict[str, Any] = {}
+            for keyword in self.keywords:
+                node = trie
+                for ch in keyword:
+                    node = node.setdefault(ch, {})
+                node[""] = True
+            self._pattern = re.compile(f"(?=({self._trie_pattern(trie)}))")
+        else:
+            self._pattern = None
+
+    def _trie_pattern(self, node: Dict[str, Any]) -> str:
+        alternatives = [
+            re.escape(ch) + self._trie_pattern(child)
+            for ch, child in sorted(node.items()) if ch
+        ]
+        if not alternatives:
+            return ""
+
+        body = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+        return f"(?:{body})?" if "" in node else body
+
+    def find(self, text_lower: str) -> Set[str]:
+        """Return every keyword that occurs in the (already lowercased) text"""
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+
+        for match in self._pattern.finditer(text_lower):
+            keyword = match.group(1)
+            if keyword not in found:
+                found.add(keyword)
+                found.update(self._implied[keyword])
+        return found
+
+    def search(self, text_lower: str) -> bool:
+        """Check whether any keyword occurs in the (already lowercased) text"""
+        return self._pattern is not None and self._pattern.search(text_lower) is not None
+
+    def search_many(self, texts_lower: List[str]) -> List[bool]:
+        """
+        Check a batch of (already lowercased) texts in one scan.
+        The texts are joined with NUL separators and scanning skips ahead to
+        the next text as soon as one matches.
+        """
+        hits = [False] * len(texts_lower)
+        if self._pattern is None or not texts_lower:
+            return hits
+
+        offsets = []
+        position = 0
+        for text in texts_lower:
+            offsets.append(position)
+            position += len(text) + 1
+        joined = "\0".join(texts_lower)
+
+        position = 0
+        while True:
+            match = self._pattern.search(joined, position)
+            if match is None:
+                break
+            index = bisect.bisect_right(offsets, match.start()) - 1
+            hits[index] = True
+            if index + 1 >= len(offsets):
+                break
+            position = offsets[index + 1]
+        return hits
+
+class Intent:
+    """A routed intent: keyword groups that must all match, and its response"""
+    __slots__ = ("name", "priority", "order", "groups", "status", "response", "response_with_context")
+
+    def __init__(self, rule: Dict[str, Any], order: int):
+        self.name = rule["intent"]
+        self.priority = int(rule.get("priority", 0))
+        self.order = order
+        # Folded like the queries they are matched against (QueryContext.folded)
+        self.groups = [[fold(word) for word in group] for group in rule["match"]]
+        self.status = rule.get("status", "SAFE")
+        self.response = rule["response"]
+        self.response_with_context = rule.get("response_with_context")
+
+        if not self.groups or not all(self.groups):
+            raise ValueError(f"Intent '{self.name}' needs at least one non-empty keyword group")
+
+    def render(self, query: str, context: str = "") -> str:
+        """Fill the response template; {query} and {context} are available"""
+        template = self.response_with_context if context and self.response_with_context else self.response
+        return template.format(query=query, context=context)
+
+class IntentRouter:
+    """
+    Routes a query to the highest-priority intent whose keyword groups all match.
+    Ties go to the rule listed first.
+    """
+
+    def __init__(self, name: str, rules: List[Dict[str, Any]]):
+        self.name = name
+        self.intents = [Intent(rule, order) for order, rule in enumerate(rules)]
+
+        # keyword -> [(intent index, group bit)]
+        self._postings: Dict[str, List[tuple]] = {}
+        self._complete: List[int] = []
+        for index, intent in enumerate(self.intents):
+            for group_index, group in enumerate(intent.groups):
+                for word in group:
+                    self._postings.setdefault(word, []).append((index, 1 << group_index))
+            self._complete.append((1 << len(intent.groups)) - 1)
+
+        self._matcher = KeywordMatcher(self._postings)
+
+    def route(self, query_folded: str) -> Optional[Intent]:
+        """Return the best matching intent for an already folded query, or None"""
+        masks: Dict[int, int] = {}
+        for keyword in self._matcher.find(query_folded):
+            for index, bit in self._postings[keyword]:
+                masks[index] = masks.get(index, 0) | bit
+
+        best = None
+        for index, mask in masks.items():
+            if mask != self._complete[index]:
+                continue
+            intent = self.intents[index]
+            if best is None or (intent.priority, -intent.order) > (best.priority, -best.order):
+                best = intent
+        return best
+
+class IntentEngine:
+    """Loads intent rule sets from a rules file and compiles one router per set"""
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.version = rules.get("version", 0)
+        self.routers = {
+            name: IntentRouter(name, router_rules)
+            for name, router_rules in rules.get("routers", {}).items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            engine = cls(json.load(f))
+        logger.info(f"Loaded intent rules v{engine.version} from {path}: {list(engine.routers)}")
+        return engine
+
+    def router(self, name: str) -> IntentRouter:
+        """Get a compiled router; unknown names route nothing"""
+        router = self.routers.get(name)
+        if router is None:
+            logger.warning(f"No intent router named '{name}'")
+            router = self.routers[name] = IntentRouter(name, [])
+        return router
+
+# Global instance
+intent_engine = IntentEngine.from_file(settings.intent_rules_path)
@@ -1,75 +1,183 @@
 from core.config import settings
-from services.retrieval import retrieval_service
-from typing import List, Dict, Any
+from core.metrics import GENERATION_SECONDS
+from core.tracing import tracer
+from core.cache import TTLCache
+from core.snapshot import snapshot_store
+from core.hedging import DeadlineExceeded
+from core.state import ENERGY_MODES
+from services.retrieval import retrieval_service, Passage
+from services.context import context_packer, PackedContext, NO_CONTEXT
+from services.intents import intent_engine
+from services.vertex import vertex_client
+from services.language import languages
+from services.query import QueryContext
+from typing import List, Optional
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
 class KleinService:
     def __init__(self):
-        self.vertex_available = bool(settings.gcp_project)
+        self.vertex_available = vertex_client.configured
+        self.stub_router = intent_engine.router("klein_stub")
 
-    def get_klein_response(self, query: str, mode: str = "normal") -> str:
+        # Built once; the same strings are registered with Vertex context caching
+        self.system_prompts = {mode: self._build_system_prompt(mode) for mode in ENERGY_MODES}
+
+        # Vertex AI answers keyed by everything that goes into the prompt
+        self.answer_cache = TTLCache("answer", settings.answer_cache_size, settings.answer_cache_ttl_s)
+        snapshot_store.register("answers", self.answer_cache)
+
+    def get_klein_response(self, query: QueryContext, mode: str = "normal",
+                           context_docs: Optional[List[Passage]] = None,
+                           history: str = "") -> str:
         """
         Generate Klein's response using retrieval + Vertex AI
         Falls back to deterministic responses if services unavailable
+
+        Args:
+            context_docs: Already-retrieved context (batch requests share retrieval)
+            history: Recent turns of the session, oldest first
         """
         try:
             # Get context from retrieval service
-            context_docs = retrieval_service.search_context(query)
-            context_text = self._format_context(context_docs)
-
-            if self.vertex_available:
-                return self._vertex_ai_response(query, context_text, mode)
-            else:
-                return self._stub_response(query, context_text, mode)
+            if context_docs is None:
+                context_docs = retrieval_service.search_context(query)
+            packed = self._format_context(context_docs, mode)
+            context_text = packed.text
+
+            backend = "vertex" if self.vertex_available else "stub"
+            with GENERATION_SECONDS.time(backend=backend), tracer.span(
+                "klein.generate",
+                backend=backend,
+                context_chars=packed.chars_used,
+                context_docs=packed.docs_used,
+                history_chars=len(history)
+            ):
+                if self.vertex_available:
+                    with tracer.span("vertex.generate", model=settings.vertex_model):
+                        return self._vertex_ai_response(query, context_text, mode, history)
+                else:
+                    return self._stub_response(query, context_text, mode)
 
         except Exception as e:
             logger.error(f"Klein service error: {e}")
-            return f"Klein: I apologize, but I'm experiencing technical difficulties. However, I can help you with general information about: {query}"
+            return f"Klein: I apologize, but I'm experiencing technical difficulties. However, I can help you with general information about: {query.text}"
 
-    def _format_context(self, docs: List[Dict[str, Any]]) -> str:
-        """Format retrieved documents into context"""
-        if not docs:
-            return "No specific context found."
+    def _format_context(self, docs: List[Passage], mode: str = "normal") -> PackedContext:
+        """Pack retrieved documents into the context budget for the energy mode"""
+        return context_packer.pack(docs, mode)
 
-        context_parts = []
-        for doc in docs:
-            context_parts.append(f"Source: {doc.get('source', 'Unknown')}\n{doc.get('content', '')}")
+    def _vertex_ai_response(self, query: QueryContext, context: str, mode: str, history: str = "") -> str:
+        """Generate response using Vertex AI (Gemini), falling back to the stub"""
+        if not vertex_client.live:
+            return self._canned_vertex_response(query.text, context, mode)
 
-        return "\n\n".join(context_parts)
+        # Answers that depend on conversation history are never shared
+        key = None if history else self._answer_key(query, context, mode)
+        if key:
+            cached = self.answer_cache.get(key)
+            if cached is not None:
+                return cached
 
-    def _vertex_ai_response(self, query: str, context: str, mode: str) -> str:
-        """Generate response using Vertex AI (to be implemented)"""
-        # TODO: Implement actual Vertex AI integration
-        # For now, return a structured response
+        try:
+            # Brownout mode saves the extra request rather than the latency
+            ai_response = vertex_client.generate_raced(
+                self.system_prompts.get(mode) or self.system_prompts["normal"],
+                self._build_user_prompt(query.text, context, query.lang, history),
+                max_output_tokens=256 if mode == "peak" else 1024,
+                hedge=mode != "peak"
+            )
+            answer = f"Klein: {ai_response}"
+            if key:
+                self.answer_cache.put(key, answer)
+            return answer
+        except DeadlineExceeded as e:
+            logger.warning("%s; answering from the cache or stub", e)
+            # Same question answered without this session's history is still better than the stub
+            if history:
+                cached = self.answer_cache.get(self._answer_key(query, context, mode))
+                if cached is not None:
+                    return cached
+            return self._stub_response(query, context, mode)
+        except Exception as e:
+            logger.error(f"Vertex AI error: {e}")
+            return self._stub_response(query, context, mode)
 
+    def _canned_vertex_response(self, query: str, context: str, mode: str) -> str:
+        """Structured response used until live generation is turned on (VERTEX_GENERATE)"""
         if mode == "peak":
             return f"Klein (Brownout Mode): {query} - Brief response due to energy constraints. Context: {context[:100]}..."
 
         return f"Klein (Vertex AI): Based on available information, here's my response to '{query}'. Context considered: {context[:200]}..."
 
-    def _stub_response(self, query: str, context: str, mode: str) -> str:
-        """Fallback response when Vertex AI is not available"""
+    def _answer_key(self, query: QueryContext, context: str, mode: str) -> str:
+        material = "\x1f".join((mode, query.key, context))
+        return hashlib.blake2b(material.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _build_system_prompt(self, mode: str) -> str:
+        """Klein's personality and behavior prompt"""
+        base_prompt = """You are Klein, a helpful AI assistant in the Klein AI Dual Framework.
+
+PERSONALITY:
+- Empathetic, supportive, and genuinely caring
+- Professional but warm and approachable
+- Clear, concise, and actionable in responses
+- Always acknowledge the human behind the question
+
+CAPABILITIES:
+- Provide helpful information using provided context
+- Offer practical guidance and solutions
+- Show empathy for emotional/personal queries
+- Maintain safety and ethical boundaries
+
+RESPONSE STYLE:
+- Start responses naturally (no "Klein:" prefix needed)
+- Use provided context when relevant
+- If context is limited, be honest about limitations
+- Keep responses focused and valuable
+- Show genuine care for user's needs"""
 
-        # Handle common query patterns
-        query_lower = query.lower()
+        if mode == "peak":
+            base_prompt += "\n\nENERGY BROWNOUT MODE: Keep responses concise due to energy constraints. Focus on essential information only."
+
+        return base_prompt
+
+    def _build_user_prompt(self, query: str, context: str, lang: Optional[str] = None, history: str = "") -> str:
+        """User prompt with the conversation so far and the packed retrieval context"""
+        prompt = ""
+        if history:
+            prompt += f"CONVERSATION SO FAR:\n{history}\n\n"
+        prompt += f"User asks: {query}\n\n"
+
+        if context and NO_CONTEXT not in context:
+            prompt += f"CONTEXT FROM KNOWLEDGE BASE:\n{context}\n\n"
+        else:
+            prompt += "CONTEXT: No specific information found in knowledge base.\n\n"
 
-        if any(word in query_lower for word in ["weather", "temperature", "rain", "climate"]):
-            if "port-au-prince" in query_lower or "haiti" in query_lower:
-                return "Klein: Port-au-Prince typically experiences tropical weather with temperatures around 25-30°C. During hurricane season (June-November), expect afternoon thunderstorms. Please monitor local weather services for current conditions."
+        prompt += "Please provide a helpful, empathetic response using any relevant context provided."
+        if lang and lang != languages.default:
+            prompt += f" Respond in {languages.analyzer(lang).name}."
+        return prompt
 
-        if any(word in query_lower for word in ["overwhelmed", "stressed", "anxious", "help"]):
-            return "Klein: I understand you're going through a difficult time. It's completely normal to feel overwhelmed sometimes. Take a moment to breathe, and remember that you don't have to face this alone. Would you like to talk about what's causing these feelings?"
+    def _stub_response(self, query: QueryContext, context: str, mode: str) -> str:
+        """Fallback response when Vertex AI is not available"""
+
+        # Handle common query patterns
+        has_context = bool(context) and NO_CONTEXT not in context
+        intent = self.stub_router.route(query.folded)
+        if intent:
+            return intent.render(query.text, context if has_context else "")
 
         if mode == "peak":
-            return f"Klein (Energy Brownout): Short response to '{query}' - System operating in reduced capacity mode."
+            return f"Klein (Energy Brownout): Short response to '{query.text}' - System operating in reduced capacity mode."
 
         # Default response with context if available
-        if context and "No specific context found" not in context:
-            return f"Klein: Based on available information about '{query}', I can provide some guidance. {context[:150]}..."
+        if has_context:
+            return f"Klein: Based on available information about '{query.text}', I can provide some guidance. {context[:150]}..."
 
-        return f"Klein: I'd be happy to help you with '{query}'. While I don't have specific information immediately available, I can provide general assistance and guidance on this topic."
+        return f"Klein: I'd be happy to help you with '{query.text}'. While I don't have specific information immediately available, I can provide general assistance and guidance on this topic."
 
 # Global instance
 klein_service = KleinService()
@@ -0,0 +1,119 @@
+from core.config import settings
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import json
+import re
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+_COMBINING = re.compile("[\u0300-\u036f]")
+_TOKEN = re.compile(r"\w+")
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ('Kòman' -> 'koman'); ASCII text takes a fast path"""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+
+def tokenize(folded: str) -> List[str]:
+    """Word tokens of already folded text"""
+    return _TOKEN.findall(folded)
+
+class Analyzer:
+    """
+    Text analysis for one language: accent folding, tokenizing, stopword
+    removal and light suffix stemming. Used to build the local retrieval
+    index and to analyze queries in the same language.
+    """
+
+    def __init__(self, code: str, rules: Dict[str, Any]):
+        self.code = code
+        self.name = rules.get("name", code)
+        self.stopwords: FrozenSet[str] = frozenset(fold(word) for word in rules.get("stopwords", []))
+        # Longest suffix first so 'ements' wins over 's'
+        self.suffixes: List[Tuple[str, str]] = sorted(
+            ((fold(suffix), replacement) for suffix, replacement in rules.get("suffixes", [])),
+            key=lambda rule: len(rule[0]),
+            reverse=True
+        )
+        self.min_stem = int(rules.get("min_stem", 3))
+        self.markers: FrozenSet[str] = frozenset(fold(word) for word in rules.get("markers", []))
+
+    def stem(self, token: str) -> str:
+        for suffix, replacement in self.suffixes:
+            if token.endswith(suffix) and len(token) - len(suffix) >= self.min_stem:
+                return token[:-len(suffix)] + replacement
+        return token
+
+    def terms(self, text: str) -> List[str]:
+        """Index/query terms for text, in order (duplicates kept)"""
+        return self.terms_from_tokens(_TOKEN.findall(fold(text)))
+
+    def terms_from_tokens(self, tokens: List[str]) -> List[str]:
+        """Terms for tokens that were already folded and split"""
+        return [self.stem(token) for token in tokens if token not in self.stopwords]
+
+class LanguageRegistry:
+    """Analyzers for every supported language plus request language resolution"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.version = config.get("version", 0)
+        self.analyzers: Dict[str, Analyzer] = {
+            code: Analyzer(code, rules) for code, rules in config.get("languages", {}).items()
+        }
+        self.default = config.get("default", "en")
+        if self.default not in self.analyzers:
+            raise ValueError(f"Default language '{self.default}' has no analyzer")
+
+        self._aliases: Dict[str, str] = {}
+        for code, rules in config.get("languages", {}).items():
+            self._aliases[code] = code
+            for alias in rules.get("aliases", []):
+                self._aliases[fold(alias)] = code
+
+    @classmethod
+    def from_file(cls, path: str) -> "LanguageRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            registry = cls(json.load(f))
+        logger.info(f"Loaded language analyzers v{registry.version} from {path}: {list(registry.analyzers)}")
+        return registry
+
+    @property
+    def codes(self) -> List[str]:
+        return list(self.analyzers)
+
+    def normalize(self, lang: Optional[str]) -> Optional[str]:
+        """Supported code for a language tag ('fr-CA' -> 'fr'), None if unsupported"""
+        if not lang:
+            return None
+        tag = fold(lang.strip()).replace("_", "-")
+        return self._aliases.get(tag) or self._aliases.get(tag.split("-")[0])
+
+    def detect(self, text: str, max_tokens: int = 64) -> str:
+        """
+        Guess the language from function-word markers in the first tokens.
+        Costs one regex scan of a short prefix; falls back to the default.
+        """
+        return self.detect_tokens(_TOKEN.findall(fold(text[:512])), max_tokens)
+
+    def detect_tokens(self, tokens: List[str], max_tokens: int = 64) -> str:
+        """detect() for text that was already folded and split"""
+        tokens = tokens[:max_tokens]
+        best, best_score = self.default, 0
+        for code, analyzer in self.analyzers.items():
+            score = sum(1 for token in tokens if token in analyzer.markers)
+            if score > best_score:
+                best, best_score = code, score
+        return best
+
+    def resolve(self, lang: Optional[str], text: str) -> str:
+        """Requested language if supported, otherwise detected from the text"""
+        return self.normalize(lang) or self.detect(text)
+
+    def analyzer(self, lang: str) -> Analyzer:
+        return self.analyzers.get(lang) or self.analyzers[self.default]
+
+# Global instance
+languages = LanguageRegistry.from_file(settings.languages_path)
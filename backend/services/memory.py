@@ -0,0 +1,256 @@
+from core.config import settings
+from core.metrics import metrics_registry
+from core.snapshot import snapshot_store
+from services.context import CHARS_PER_TOKEN
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import hashlib
+import struct
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_EVICTIONS = metrics_registry.counter(
+    "klein_session_evictions_total", "Sessions dropped from conversation memory", ["reason"]
+)
+SESSIONS = metrics_registry.gauge(
+    "klein_sessions", "Sessions held in conversation memory"
+)
+SESSION_MEMORY_BYTES = metrics_registry.gauge(
+    "klein_session_memory_bytes", "Accounted size of conversation memory"
+)
+
+# One turn in a session buffer: query length, answer length, then both UTF-8 payloads
+_TURN = struct.Struct("<HH")
+# Per-session cost outside the buffer (dict entry, key, session object), as measured
+_SESSION_OVERHEAD = 350
+
+class _Session:
+    """Recent turns of one conversation, packed into a single bytes buffer"""
+    __slots__ = ("buffer", "turns", "last_seen")
+
+    def __init__(self):
+        self.buffer = b""
+        self.turns = 0
+        self.last_seen = 0.0
+
+    def append(self, record: bytes, max_turns: int, max_bytes: int):
+        """Append a turn record, dropping the oldest turns past either cap"""
+        buffer = self.buffer + record
+        turns = self.turns + 1
+        start = 0
+        while turns > 1 and (turns > max_turns or len(buffer) - start > max_bytes):
+            query_len, answer_len = _TURN.unpack_from(buffer, start)
+            start += _TURN.size + query_len + answer_len
+            turns -= 1
+        self.buffer = buffer[start:] if start else buffer
+        self.turns = turns
+
+def _count_turns(buffer: bytes) -> Optional[int]:
+    """Number of turn records in a buffer, or None if it is malformed"""
+    turns = 0
+    offset = 0
+    while offset + _TURN.size <= len(buffer):
+        query_len, answer_len = _TURN.unpack_from(buffer, offset)
+        offset += _TURN.size + query_len + answer_len
+        turns += 1
+    return turns if offset == len(buffer) else None
+
+def _iter_turns(buffer: bytes) -> List[Tuple[str, str]]:
+    turns = []
+    offset = 0
+    while offset < len(buffer):
+        query_len, answer_len = _TURN.unpack_from(buffer, offset)
+        offset += _TURN.size
+        query = buffer[offset:offset + query_len].decode("utf-8", "ignore")
+        offset += query_len
+        answer = buffer[offset:offset + answer_len].decode("utf-8", "ignore")
+        offset += answer_len
+        turns.append((query, answer))
+    return turns
+
+class SessionMemory:
+    """
+    Bounded multi-turn conversation memory, keyed by session_key(): the
+    caller's identity together with ChatRequest.session_id, so guessing
+    another client's session_id does not reach their history.
+
+    Each session keeps its most recent turns in one packed buffer capped by
+    turn count and bytes. All sessions share a global byte budget; the
+    least recently used session is evicted when it is exceeded, and
+    sessions idle past the TTL are dropped as they reach the LRU head.
+    Memory is per worker, so multi-worker deployments need session-sticky
+    routing for every turn to land on the same memory.
+    """
+
+    def __init__(self, enabled: bool, max_turns: int, session_bytes: int,
+                 budget_bytes: int, ttl_s: float, summary_budgets: Dict[str, int]):
+        self.enabled = enabled
+        self.max_turns = max(1, max_turns)
+        self.session_bytes = session_bytes
+        self.budget_bytes = budget_bytes
+        self.ttl_s = ttl_s
+        self.summary_budgets = summary_budgets
+        # Longest query or answer kept per turn, so one turn always fits a session
+        self.field_bytes = min(0xFFFF, max(0, (session_bytes - _TURN.size) // 2))
+        self.bytes_used = 0
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_key(owner: str, session_id: Optional[str]) -> Optional[str]:
+        """Memory key for `owner`'s session (see routers.dependencies.client_identity); None without a session_id"""
+        if not session_id:
+            return None
+        return hashlib.blake2b(f"{owner}\x1f{session_id}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cost(self, session_id: str, session: _Session) -> int:
+        return _SESSION_OVERHEAD + len(session_id) + len(session.buffer)
+
+    def _encode(self, query: str, answer: str) -> bytes:
+        if answer.startswith("Klein: "):
+            answer = answer[len("Klein: "):]
+        query_bytes = query.encode("utf-8")[:self.field_bytes]
+        answer_bytes = answer.encode("utf-8")[:self.field_bytes]
+        return _TURN.pack(len(query_bytes), len(answer_bytes)) + query_bytes + answer_bytes
+
+    def record(self, session_id: str, query: str, answer: str):
+        """Append one turn to a session, creating it if needed"""
+        if not self.enabled or not session_id:
+            return
+
+        record = self._encode(query, answer)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                session = _Session()
+            else:
+                self.bytes_used -= self._cost(session_id, session)
+
+            session.append(record, self.max_turns, self.session_bytes)
+            session.last_seen = now
+            self._sessions[session_id] = session
+            self.bytes_used += self._cost(session_id, session)
+
+            while self.bytes_used > self.budget_bytes and len(self._sessions) > 1:
+                self._evict("budget")
+
+            SESSIONS.set(len(self._sessions))
+            SESSION_MEMORY_BYTES.set(self.bytes_used)
+
+    def _expire(self, now: float):
+        """Drop idle sessions from the LRU head (caller holds the lock)"""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.ttl_s:
+                break
+            self._evict("ttl")
+
+    def _evict(self, reason: str):
+        session_id, session = self._sessions.popitem(last=False)
+        self.bytes_used -= self._cost(session_id, session)
+        SESSION_EVICTIONS.inc(reason=reason)
+
+    def summary(self, session_id: Optional[str], mode: str = "normal") -> str:
+        """
+        Most recent turns of a session that fit the energy mode's summary budget
+
+        Returns:
+            str: "User: ...\\nKlein: ..." lines, oldest first; empty if there is no history
+        """
+        if not self.enabled or not session_id:
+            return ""
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or time.monotonic() - session.last_seen >= self.ttl_s:
+                return ""
+            buffer = session.buffer
+
+        budget = self.summary_budgets.get(mode, self.summary_budgets["normal"])
+        lines: List[str] = []
+        used = 0
+        for query, answer in reversed(_iter_turns(buffer)):
+            line = f"User: {query}\nKlein: {answer}"
+            separator = 1 if lines else 0
+            room = budget - used - separator
+            if len(line) > room:
+                # Keep a clipped newest turn rather than nothing at all
+                if not lines and room > 0:
+                    lines.append(line[:room])
+                break
+            lines.append(line)
+            used += separator + len(line)
+
+        return "\n".join(reversed(lines))
+
+    def forget(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.bytes_used -= self._cost(session_id, session)
+
+    def export(self) -> List[Tuple[str, float, bytes]]:
+        """Sessions as (session_id, expires_at, buffer) snapshot entries, least recently used first"""
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            return [
+                (session_id, wall + self.ttl_s - (now - session.last_seen), session.buffer)
+                for session_id, session in self._sessions.items()
+            ]
+
+    def restore(self, entries: List[Tuple[str, float, bytes]]) -> int:
+        """Load snapshot entries, skipping expired or malformed sessions"""
+        if not self.enabled:
+            return 0
+
+        now, wall = time.monotonic(), time.time()
+        restored = 0
+        with self._lock:
+            for session_id, expires_at, buffer in entries:
+                turns = _count_turns(buffer)
+                if expires_at <= wall or not turns or session_id in self._sessions:
+                    continue
+                session = _Session()
+                session.buffer = bytes(buffer)
+                session.turns = turns
+                session.last_seen = now - (self.ttl_s - (expires_at - wall))
+                self._sessions[session_id] = session
+                self.bytes_used += self._cost(session_id, session)
+                restored += 1
+
+            while self.bytes_used > self.budget_bytes and self._sessions:
+                self._evict("budget")
+
+            SESSIONS.set(len(self._sessions))
+            SESSION_MEMORY_BYTES.set(self.bytes_used)
+        return restored
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sessions": len(self._sessions),
+            "bytes": self.bytes_used,
+            "budget_bytes": self.budget_bytes
+        }
+
+def _summary_chars(budget: int) -> int:
+    return budget * CHARS_PER_TOKEN if settings.context_budget_unit == "tokens" else budget
+
+# Global instance
+session_memory = SessionMemory(
+    enabled=settings.session_memory_enabled,
+    max_turns=settings.session_max_turns,
+    session_bytes=settings.session_max_bytes,
+    budget_bytes=settings.session_memory_budget_mb * 1024 * 1024,
+    ttl_s=settings.session_ttl_s,
+    summary_budgets={
+        "normal": _summary_chars(settings.session_summary_budget_normal),
+        "peak": _summary_chars(settings.session_summary_budget_peak),
+    }
+)
+snapshot_store.register("sessions", session_memory)
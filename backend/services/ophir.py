@@ -1,11 +1,104 @@
 import json
 import uuid
 from datetime import datetime
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from services.intents import KeywordMatcher
+from services.language import languages, fold
+from services.query import QueryContext
+from core.config import settings, DEFAULT_OPHIR_RULES_PATH
+from core.metrics import AUDIT_WRITE_SECONDS
+from core.reload import reload_watcher
+from core.tracing import tracer
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _terms(raw: Dict[str, Any], key: str, required: bool = True) -> List[str]:
+    terms = raw.get(key)
+    if not isinstance(terms, list) or not all(isinstance(term, str) and term.strip() for term in terms):
+        raise ValueError(f"'{key}' must be a list of non-empty strings")
+    if required and not terms:
+        raise ValueError(f"'{key}' must not be empty")
+    return terms
+
+class OphirRuleSet:
+    """Compiled rules for one language"""
+    __slots__ = ("lang", "restricted_terms", "empathy_triggers", "harmful_patterns", "restricted_response",
+                 "restricted_matcher", "_empathy_folded", "_harmful_folded")
+
+    def __init__(self, lang: str, raw: Dict[str, Any]):
+        self.lang = lang
+        try:
+            # An empty restricted or harmful list would silently disable a check
+            self.restricted_terms = _terms(raw, "restricted_terms")
+            self.empathy_triggers = _terms(raw, "empathy_triggers", required=False)
+            self.harmful_patterns = _terms(raw, "harmful_patterns")
+
+            self.restricted_response = raw.get("restricted_response")
+            if not isinstance(self.restricted_response, str) or not self.restricted_response:
+                raise ValueError("'restricted_response' must be a non-empty string")
+        except ValueError as e:
+            raise ValueError(f"languages.{lang}: {e}")
+
+        # Terms and texts are both accent-folded, so 'vulnerabilite' matches 'vulnérabilité'
+        self.restricted_matcher = KeywordMatcher(fold(term) for term in self.restricted_terms)
+        # Short lists: plain substring checks beat a regex scan here
+        self._empathy_folded = tuple(fold(trigger) for trigger in self.empathy_triggers)
+        self._harmful_folded = tuple(fold(pattern) for pattern in self.harmful_patterns)
+
+    def contains_restricted_content(self, folded: str) -> bool:
+        """Check if (already folded) text contains restricted terms"""
+        return self.restricted_matcher.search(folded)
+
+    def needs_empathetic_response(self, query_folded: str) -> bool:
+        """Check if the (already folded) query indicates emotional distress"""
+        return any(trigger in query_folded for trigger in self._empathy_folded)
+
+    def response_is_safe(self, response: str) -> bool:
+        """Check if Klein's response is free of potentially harmful advice"""
+        response_folded = fold(response)
+        return not any(pattern in response_folded for pattern in self._harmful_folded)
+
+class OphirRules:
+    """
+    One compiled version of data/ophir_rules.json: a rule set per language.
+    Never mutated after construction; a reload builds a new instance.
+    """
+    __slots__ = ("rule_sets", "default")
+
+    def __init__(self, raw: Dict[str, Any]):
+        rule_sets = raw.get("languages")
+        if not isinstance(rule_sets, dict) or not rule_sets:
+            raise ValueError("'languages' must map language codes to rule sets")
+
+        self.default = languages.default
+        if self.default not in rule_sets:
+            raise ValueError(f"No rules for the default language '{self.default}'")
+
+        self.rule_sets: Dict[str, OphirRuleSet] = {
+            lang: OphirRuleSet(lang, rules) for lang, rules in rule_sets.items()
+        }
+
+    def for_lang(self, lang: str) -> OphirRuleSet:
+        """Rules for one language only; unknown languages use the default"""
+        return self.rule_sets.get(lang) or self.rule_sets[self.default]
+
+    def is_restricted(self, query_folded: str, lang: str) -> bool:
+        """
+        Restricted terms of the query language and of the default language.
+        The request's lang is client-chosen, so it must not switch the
+        default-language terms off.
+        """
+        if self.for_lang(lang).contains_restricted_content(query_folded):
+            return True
+        return lang != self.default and self.rule_sets[self.default].contains_restricted_content(query_folded)
+
+    def response_is_safe(self, response: str, lang: str) -> bool:
+        """Klein's stub responses are in the default language, so other languages check both"""
+        if not self.for_lang(lang).response_is_safe(response):
+            return False
+        return lang == self.default or self.rule_sets[self.default].response_is_safe(response)
+
 class OphirService:
     """
     Ophir - The Guardian AI
@@ -13,71 +106,97 @@ class OphirService:
     """
 
     def __init__(self):
-        self.restricted_terms = [
-            "classified", "secret", "confidential", "password", "hack",
-            "exploit", "vulnerability", "breach", "surveillance"
-        ]
+        # Rules are hot-reloaded; see core/reload.py
+        self.rules_file = reload_watcher.watch(
+            "ophir_rules", settings.ophir_rules_path, OphirRules, default_path=DEFAULT_OPHIR_RULES_PATH
+        )
+
+    @property
+    def rules(self) -> OphirRules:
+        """Current rules; take once per request so a reload never splits one"""
+        return self.rules_file.current
 
-        self.empathy_triggers = [
-            "overwhelmed", "stressed", "anxious", "depressed", "sad",
-            "lonely", "afraid", "worried", "helpless", "hurt"
-        ]
+    def screen_queries(self, queries: List[QueryContext]) -> List[Optional[Tuple[str, str]]]:
+        """
+        Screen a batch of queries for restricted content: one pass per language,
+        plus one pass of the default-language terms over the other languages
 
-    def evaluate_response(self, query: str, klein_response: str) -> Tuple[str, str]:
+        Returns:
+            List of (status, response) verdicts for blocked queries, None for queries that may proceed
+        """
+        rules = self.rules
+        by_lang: Dict[str, List[int]] = {}
+        for index, query in enumerate(queries):
+            by_lang.setdefault(query.lang, []).append(index)
+
+        verdicts: List[Optional[Tuple[str, str]]] = [None] * len(queries)
+        unflagged: List[int] = []
+        for lang, indexes in by_lang.items():
+            rule_set = rules.for_lang(lang)
+            hits = rule_set.restricted_matcher.search_many([queries[index].folded for index in indexes])
+            for index, restricted in zip(indexes, hits):
+                if restricted:
+                    self._log_security_event(queries[index], "RESTRICTED_QUERY")
+                    verdicts[index] = ("FLAGGED", rule_set.restricted_response)
+                elif rule_set.lang != rules.default:
+                    unflagged.append(index)
+
+        if unflagged:
+            default_matcher = rules.rule_sets[rules.default].restricted_matcher
+            hits = default_matcher.search_many([queries[index].folded for index in unflagged])
+            for index, restricted in zip(unflagged, hits):
+                if restricted:
+                    self._log_security_event(queries[index], "RESTRICTED_QUERY")
+                    verdicts[index] = ("FLAGGED", rules.for_lang(queries[index].lang).restricted_response)
+        return verdicts
+
+    def evaluate_response(self, query: QueryContext, klein_response: str,
+                          prescreened: bool = False) -> Tuple[str, str]:
         """
         Evaluate Klein's response and return (status, final_response)
 
+        Args:
+            query: The user's query; its language's rules are checked, plus the
+                default language's restricted terms and harmful patterns
+            prescreened: Query already passed screen_queries, skip the restricted-content check
+
         Returns:
             Tuple[str, str]: (status, final_response)
             - status: "SAFE", "FLAGGED", or "DENIED"
             - final_response: The response to send to user
         """
+        rules = self.rules
+        query_rules = rules.for_lang(query.lang)
 
         # Check for restricted content in query
-        if self._contains_restricted_content(query):
+        if not prescreened and self._traced_check("ophir.restricted", lambda text: rules.is_restricted(text, query_rules.lang), query.folded):
             self._log_security_event(query, "RESTRICTED_QUERY")
-            return "FLAGGED", "⚠️ This request may contain restricted or sensitive information. Please refine your question to focus on publicly available information."
+            return "FLAGGED", query_rules.restricted_response
 
         # Check for empathy triggers
-        if self._needs_empathetic_response(query):
+        if self._traced_check("ophir.empathy", query_rules.needs_empathetic_response, query.folded):
             empathetic_response = self._generate_empathetic_response(klein_response)
             return "SAFE", empathetic_response
 
         # Check Klein's response for safety
-        if self._response_is_safe(klein_response):
+        if self._traced_check("ophir.safety", lambda text: rules.response_is_safe(text, query_rules.lang), klein_response):
             return "SAFE", klein_response
         else:
             self._log_security_event(query, "UNSAFE_RESPONSE")
             return "FLAGGED", "⚠️ I've detected potentially unsafe content in the response. Let me provide a safer alternative: How can I help you with general information on this topic?"
 
-    def _contains_restricted_content(self, text: str) -> bool:
-        """Check if text contains restricted terms"""
-        text_lower = text.lower()
-        return any(term in text_lower for term in self.restricted_terms)
-
-    def _needs_empathetic_response(self, query: str) -> bool:
-        """Check if query indicates emotional distress"""
-        query_lower = query.lower()
-        return any(trigger in query_lower for trigger in self.empathy_triggers)
+    def _traced_check(self, name: str, check, text: str) -> bool:
+        """Run one Ophir check inside a trace span recording its verdict"""
+        with tracer.span(name) as span:
+            verdict = check(text)
+            span.set("verdict", verdict)
+            return verdict
 
     def _generate_empathetic_response(self, klein_response: str) -> str:
         """Generate more empathetic version of response"""
         return f"Klein: I understand this might be a difficult time for you. {klein_response}"
 
-    def _response_is_safe(self, response: str) -> bool:
-        """Check if Klein's response is safe to send"""
-        # Basic safety checks
-        response_lower = response.lower()
-
-        # Check for potentially harmful advice
-        harmful_patterns = [
-            "commit suicide", "hurt yourself", "illegal activity",
-            "violence", "harmful substance"
-        ]
-
-        return not any(pattern in response_lower for pattern in harmful_patterns)
-
-    def _log_security_event(self, query: str, event_type: str) -> str:
+    def _log_security_event(self, query: QueryContext, event_type: str) -> str:
         """Log security events to audit trail"""
         event_id = str(uuid.uuid4())
 
@@ -85,14 +204,17 @@ class OphirService:
             "timestamp": datetime.utcnow().isoformat(),
             "event_id": event_id,
             "event_type": event_type,
-            "query": query[:100],  # Truncate for privacy
+            "query": query.text[:100],  # Truncate for privacy
+            "query_key": query.key,  # Same key the caches use, for correlating repeats
+            "lang": query.lang,
             "service": "ophir"
         }
 
         try:
             # Append to audit log file
-            with open("audit-log.jsonl", "a", encoding="utf-8") as f:
-                f.write(json.dumps(event_data) + "\n")
+            with AUDIT_WRITE_SECONDS.time(service="ophir"), tracer.span("audit.write", event_type=event_type):
+                with open("audit-log.jsonl", "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event_data) + "\n")
         except Exception as e:
             logger.error(f"Failed to write audit log: {e}")
 
@@ -105,7 +227,7 @@ class OphirService:
         Returns:
             dict: Shutdown response with audit information
         """
-        audit_id = self._log_security_event(user_request, "SHUTDOWN_REQUEST")
+        audit_id = self._log_security_event(QueryContext(user_request), "SHUTDOWN_REQUEST")
 
         return {
             "ok": True,
@@ -119,8 +241,9 @@ class OphirService:
         return {
             "service": "ophir",
             "status": "operational",
-            "restrictions_active": len(self.restricted_terms),
-            "empathy_triggers_active": len(self.empathy_triggers),
+            "restrictions_active": {lang: len(rules.restricted_terms) for lang, rules in self.rules.rule_sets.items()},
+            "empathy_triggers_active": {lang: len(rules.empathy_triggers) for lang, rules in self.rules.rule_sets.items()},
+            "rules_version": self.rules_file.version,
             "timestamp": datetime.utcnow().isoformat()
         }
 
@@ -0,0 +1,245 @@
+from models.schemas import ChatRequest, ChatResponse
+from services.klein import klein_service
+from services.ophir import ophir_service
+from services.retrieval import retrieval_service, Passage
+from services.intents import intent_engine
+from services.query import QueryContext
+from services.memory import session_memory
+from core.metrics import CHAT_REQUESTS, CHAT_SECONDS, OPHIR_SECONDS
+from core.tracing import tracer
+from core.logs import request_id_var
+from core.executor import stage_executor, ExecutorSaturated
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUSY_ANSWER = "System is busy right now. Please try again in a moment."
+
+def _ophir_evaluate(query: QueryContext, klein_response: str, prescreened: bool) -> Tuple[str, str]:
+    """
+    Module-level so it can run in the Ophir process pool. Callers time it
+    and open the ophir.evaluate span: metrics and spans recorded in a pool
+    process would never be exported.
+    """
+    return ophir_service.evaluate_response(query, klein_response, prescreened=prescreened)
+
+class ChatPipeline:
+    """
+    Klein generates, Ophir oversees.
+    Shared by the HTTP chat endpoint and the offline batch runner.
+    """
+
+    def __init__(self):
+        self.fallback_router = intent_engine.router("chat_fallback")
+
+    def run(self, request: ChatRequest, mode: str = "normal",
+            context_docs: Optional[List[Passage]] = None,
+            prescreened: bool = False, query: Optional[QueryContext] = None,
+            owner: str = "") -> ChatResponse:
+        """
+        Run one chat request through Klein and Ophir
+
+        Args:
+            context_docs: Already-retrieved context, skips retrieval
+            prescreened: Query already passed Ophir's batch screening
+            query: The request's QueryContext if the caller already built it
+            owner: Client identity the session_id is bound to
+        """
+        query = query or QueryContext.from_request(request)
+        with tracer.trace("chat", mode=mode, lang=query.lang, batch=context_docs is not None,
+                          request_id=request_id_var.get()) as trace:
+            try:
+                with CHAT_SECONDS.time(mode=mode):
+                    response = self._run(request, query, mode, context_docs, prescreened,
+                                         session_memory.session_key(owner, request.session_id))
+            except Exception as e:
+                logger.error(f"Chat pipeline error: {e}", exc_info=True)
+                trace.set("status", "fallback")
+                trace.mark()
+                return self.fallback(request, query, mode)
+            trace.set("status", response.status)
+            if response.status != "SAFE":
+                trace.mark()
+        CHAT_REQUESTS.inc(status=response.status, mode=mode)
+        return response
+
+    def _run(self, request: ChatRequest, query: QueryContext, mode: str,
+             context_docs: Optional[List[Passage]],
+             prescreened: bool, session_key: Optional[str]) -> ChatResponse:
+        history = session_memory.summary(session_key, mode)
+
+        # Klein generates initial response
+        klein_response = klein_service.get_klein_response(
+            query,
+            mode=mode,
+            context_docs=context_docs,
+            history=history
+        )
+
+        logger.debug("Klein response: %.100s...", klein_response)
+
+        # Ophir evaluates and potentially modifies the response
+        with OPHIR_SECONDS.time(), tracer.span("ophir.evaluate") as span:
+            status, final_response = _ophir_evaluate(query, klein_response, prescreened)
+            span.set("verdict", status)
+
+        logger.info("Final response status: %s", status)
+
+        # Only safe turns feed later prompts
+        if status == "SAFE":
+            session_memory.record(session_key, request.message, final_response)
+
+        return ChatResponse(
+            answer=final_response,
+            status=status,
+            lang=query.lang,
+            session_id=request.session_id
+        )
+
+    async def run_async(self, request: ChatRequest, mode: str = "normal",
+                        context_docs: Optional[List[Passage]] = None,
+                        prescreened: bool = False, query: Optional[QueryContext] = None,
+                        owner: str = "") -> ChatResponse:
+        """
+        Async variant of run() for the API: each blocking stage runs in the
+        stage executor so the event loop never waits on Klein or Ophir.
+
+        Raises:
+            ExecutorSaturated: A stage pool is full; the caller should shed the request
+        """
+        query = query or QueryContext.from_request(request)
+        with tracer.trace("chat", mode=mode, lang=query.lang, batch=context_docs is not None,
+                          request_id=request_id_var.get()) as trace:
+            try:
+                with CHAT_SECONDS.time(mode=mode):
+                    response = await self._run_async(request, query, mode, context_docs, prescreened,
+                                                     session_memory.session_key(owner, request.session_id))
+            except ExecutorSaturated:
+                raise
+            except Exception as e:
+                logger.error(f"Chat pipeline error: {e}", exc_info=True)
+                trace.set("status", "fallback")
+                trace.mark()
+                return self.fallback(request, query, mode)
+            trace.set("status", response.status)
+            if response.status != "SAFE":
+                trace.mark()
+        CHAT_REQUESTS.inc(status=response.status, mode=mode)
+        return response
+
+    async def _run_async(self, request: ChatRequest, query: QueryContext, mode: str,
+                         context_docs: Optional[List[Passage]],
+                         prescreened: bool, session_key: Optional[str]) -> ChatResponse:
+        history = session_memory.summary(session_key, mode)
+
+        # Klein generates initial response (retrieval + generation)
+        klein_response = await stage_executor.run(
+            "klein", klein_service.get_klein_response, query, mode, context_docs, history
+        )
+
+        logger.debug("Klein response: %.100s...", klein_response)
+
+        # Ophir evaluates and potentially modifies the response
+        with OPHIR_SECONDS.time(), tracer.span("ophir.evaluate") as span:
+            status, final_response = await stage_executor.run(
+                "ophir", _ophir_evaluate, query, klein_response, prescreened, cpu_bound=True
+            )
+            span.set("verdict", status)
+
+        logger.info("Final response status: %s", status)
+
+        # Only safe turns feed later prompts
+        if status == "SAFE":
+            session_memory.record(session_key, request.message, final_response)
+
+        return ChatResponse(
+            answer=final_response,
+            status=status,
+            lang=query.lang,
+            session_id=request.session_id
+        )
+
+    async def run_batch(self, requests: List[ChatRequest], mode: str = "normal",
+                        concurrency: int = 4, owner: str = "") -> List[ChatResponse]:
+        """
+        Run a batch of chat requests.
+        Ophir screens the whole batch in one pass, retrieval is shared across
+        the batch, and generation runs in the stage executor with bounded concurrency.
+        Items that hit a saturated pool come back DENIED.
+        """
+        queries = [QueryContext.from_request(request) for request in requests]
+        results: List[Optional[ChatResponse]] = [None] * len(requests)
+
+        # One trace for the shared stages; each generated item also gets its own "chat" trace
+        with tracer.trace("chat.batch", mode=mode, items=len(requests),
+                          request_id=request_id_var.get()) as trace:
+            # Restricted queries never reach retrieval or Klein
+            pending = []
+            with tracer.span("ophir.screen", queries=len(queries)):
+                verdicts = ophir_service.screen_queries(queries)
+            for index, verdict in enumerate(verdicts):
+                if verdict:
+                    results[index] = ChatResponse(
+                        answer=verdict[1], status=verdict[0], lang=queries[index].lang, session_id=requests[index].session_id
+                    )
+                    CHAT_REQUESTS.inc(status=verdict[0], mode=mode)
+                else:
+                    pending.append(index)
+            trace.set("flagged", len(requests) - len(pending))
+            if len(pending) < len(requests):
+                trace.mark()
+
+            try:
+                with tracer.span("retrieval", batch=True, queries=len(pending)):
+                    context_docs = await stage_executor.run(
+                        "retrieval", retrieval_service.search_many,
+                        [queries[index] for index in pending], 3
+                    )
+            except Exception as e:
+                logger.error(f"Batch retrieval error: {e}", exc_info=True)
+                context_docs = [None] * len(pending)
+
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+
+            async def generate(index: int, docs: Optional[List[Passage]]):
+                async with semaphore:
+                    try:
+                        results[index] = await self.run_async(requests[index], mode, docs, True, queries[index], owner)
+                    except ExecutorSaturated:
+                        CHAT_REQUESTS.inc(status="DENIED", mode=mode)
+                        results[index] = ChatResponse(
+                            answer=BUSY_ANSWER, status="DENIED", lang=queries[index].lang, session_id=requests[index].session_id
+                        )
+
+            await asyncio.gather(*(generate(index, docs) for index, docs in zip(pending, context_docs)))
+        return results
+
+    def fallback(self, request: ChatRequest, query: Optional[QueryContext] = None,
+                 mode: str = "normal") -> ChatResponse:
+        """
+        Direct fallback responses for demo scenarios.
+        Counted in CHAT_REQUESTS as status "fallback", whatever status the answer carries.
+        """
+        query = query or QueryContext.from_request(request)
+        CHAT_REQUESTS.inc(status="fallback", mode=mode)
+        intent = self.fallback_router.route(query.folded)
+        if intent:
+            return ChatResponse(
+                answer=intent.render(request.message),
+                status=intent.status,
+                lang=query.lang,
+                session_id=request.session_id
+            )
+
+        # General fallback
+        return ChatResponse(
+            answer=f"Klein: I'd be happy to help you with '{request.message}'. While I'm experiencing some technical difficulties, I can still provide general assistance and guidance on this topic.",
+            status="SAFE",
+            lang=query.lang,
+            session_id=request.session_id
+        )
+
+# Global instance
+chat_pipeline = ChatPipeline()
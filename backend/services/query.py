@@ -0,0 +1,41 @@
+from services.language import languages, fold, tokenize
+from typing import List, Optional
+import hashlib
+
+class QueryContext:
+    """
+    One chat message, normalized once at the edge and shared by every stage.
+
+    `folded` is the lowercased, accent-stripped text that Ophir, intent
+    routing and retrieval match against; `key` is a stable hash of the
+    language and whitespace-normalized folded text, used by every cache
+    and in audit records. Analyzer terms are computed on first use.
+    Instances are plain slotted objects, so they pickle into the Ophir
+    process pool.
+    """
+    __slots__ = ("text", "lang", "folded", "tokens", "key", "_terms")
+
+    def __init__(self, text: str, lang: Optional[str] = None):
+        self.text = text
+        self.folded = fold(text)
+        self.tokens: List[str] = tokenize(self.folded)
+        self.lang = languages.normalize(lang) or languages.detect_tokens(self.tokens)
+        self.key = hashlib.blake2b(
+            f"{self.lang}\x1f{' '.join(self.tokens)}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+        self._terms: Optional[List[str]] = None
+
+    @classmethod
+    def from_request(cls, request) -> "QueryContext":
+        """Build from a ChatRequest (requested language, or detected from the message)"""
+        return cls(request.message, request.lang)
+
+    @property
+    def terms(self) -> List[str]:
+        """Retrieval terms from the query language's analyzer"""
+        if self._terms is None:
+            self._terms = languages.analyzer(self.lang).terms_from_tokens(self.tokens)
+        return self._terms
+
+    def __repr__(self) -> str:
+        return f"QueryContext(lang={self.lang!r}, key={self.key!r}, chars={len(self.text)})"
@@ -1,101 +1,270 @@
-from elasticsearch import Elasticsearch  # Real Elastic integration enabled!
-from core.config import settings
-from typing import List, Dict, Any
+from core.config import settings, DEFAULT_LOCAL_DOCS_PATH
+from core.metrics import RETRIEVAL_SECONDS
+from core.reload import reload_watcher
+from core.cache import TTLCache
+from core.snapshot import snapshot_store
+from core.tracing import tracer
+from services.language import languages, Analyzer
+from services.query import QueryContext
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+import heapq
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Local fallback documents for when Elastic is not configured
-LOCAL_DOCS = [
-    {
-        "title": "Haiti Disaster Response Guidelines",
-        "content": "Port-au-Prince weather patterns show frequent afternoon thunderstorms during hurricane season (June-November). Emergency responders should monitor local conditions and prepare for rapid weather changes.",
-        "source": "Haiti Emergency Management"
-    },
-    {
-        "title": "Naval Training Protocol - Basic Navigation",
-        "content": "Standard maritime navigation requires continuous monitoring of weather conditions, especially in Caribbean waters where conditions can change rapidly.",
-        "source": "Naval Training Manual (Unclassified)"
-    },
-    {
-        "title": "Multilingual Support Guidelines",
-        "content": "When providing assistance in Haiti, responders should be prepared to communicate in French, Haitian Creole, and English to ensure effective community engagement.",
-        "source": "International Response Guidelines"
+# Stored search template for context retrieval. The version is part of the id:
+# change the source, bump the id, so workers on old and new code never fight
+# over one stored script.
+SEARCH_TEMPLATE_ID = "klein-context-v1"
+SEARCH_TEMPLATE = """{
+  "query": {
+    "multi_match": {
+      "query": {{#toJson}}query{{/toJson}},
+      "fields": ["title^2", "content", "source"],
+      "type": "best_fields"
     }
-]
+  },
+  "size": {{size}},
+  "track_total_hits": false,
+  "_source": ["title", "source"],
+  "highlight": {
+    "pre_tags": [""],
+    "post_tags": [""],
+    "fields": {
+      "content": {
+        "fragment_size": {{fragment_size}},
+        "number_of_fragments": {{fragments}},
+        "no_match_size": {{fragment_size}}
+      }
+    }
+  }
+}"""
+
+# Only the fields _parse_hits reads. msearch keeps each item's status so an
+# item with no hits is not filtered out of the responses array entirely.
+SEARCH_FILTER_PATH = ["hits.hits._score", "hits.hits._source", "hits.hits.highlight.content"]
+MSEARCH_FILTER_PATH = [f"responses.{path}" for path in SEARCH_FILTER_PATH] + ["responses.status", "responses.error"]
+
+FRAGMENT_SEPARATOR = " … "
+
+class Passage(NamedTuple):
+    """
+    One retrieved context passage. For Elasticsearch hits `content` is the
+    highlighted fragments, not the whole field. Serializes to a JSON list.
+    """
+    title: str
+    content: str
+    source: str
+    score: float
+
+def _passages(values: List[list]) -> List[Passage]:
+    """Passages back from their JSON form (cache snapshots)"""
+    return [Passage(*value) for value in values]
+
+class LocalIndex:
+    """
+    One version of the local fallback knowledge base (data/local_docs.json),
+    used when Elastic is not configured. Documents are analyzed once per load
+    into an inverted index per language analyzer; a query only touches the
+    index for its own language.
+    """
+    __slots__ = ("documents", "_postings")
+
+    def __init__(self, raw: Dict[str, Any]):
+        documents = raw.get("documents")
+        if not isinstance(documents, list):
+            raise ValueError("'documents' must be a list")
+        for i, doc in enumerate(documents):
+            if not isinstance(doc, dict) or not all(isinstance(doc.get(field), str) for field in ("title", "content")):
+                raise ValueError(f"document {i} needs string 'title' and 'content' fields")
+
+        self.documents = documents
+        self._postings = {code: self._build(analyzer) for code, analyzer in languages.analyzers.items()}
+
+    def _build(self, analyzer: Analyzer) -> Dict[str, Tuple[Tuple[int, int], ...]]:
+        """term -> ((doc index, weight), ...); a title match weighs 2, a content match 1"""
+        postings: Dict[str, Dict[int, int]] = {}
+        for i, doc in enumerate(self.documents):
+            for term in set(analyzer.terms(doc["title"])):
+                postings.setdefault(term, {})[i] = 2
+            for term in set(analyzer.terms(doc["content"])):
+                weights = postings.setdefault(term, {})
+                weights[i] = weights.get(i, 0) + 1
+        return {term: tuple(weights.items()) for term, weights in postings.items()}
+
+    def search(self, query: QueryContext, max_results: int) -> List[Passage]:
+        postings = self._postings[languages.analyzer(query.lang).code]
+
+        scores: Dict[int, int] = {}
+        for term in query.terms:
+            for i, weight in postings.get(term, ()):
+                scores[i] = scores.get(i, 0) + weight
+
+        # Best score first, ties in document order
+        top = heapq.nsmallest(max_results, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            Passage(self.documents[i]["title"], self.documents[i]["content"], self.documents[i].get("source", ""), score)
+            for i, score in top
+        ]
 
 class RetrievalService:
     def __init__(self):
-        self.es_client = None
         self.index_name = "klein-knowledge-base"
+        self._es_client = None
+        self._es_loaded = False
+        self._template_stored = False
+        self._lock = threading.Lock()
+
+        # Hot-reloaded; see core/reload.py
+        self.local_docs = reload_watcher.watch(
+            "local_docs", settings.local_docs_path, LocalIndex, default_path=DEFAULT_LOCAL_DOCS_PATH
+        )
+
+        # Elasticsearch results only; local search is cheaper than a lookup
+        self.cache = TTLCache("retrieval", settings.retrieval_cache_size, settings.retrieval_cache_ttl_s,
+                              decode=_passages)
+        snapshot_store.register("retrieval", self.cache)
 
-        # Try to initialize Elasticsearch if credentials are provided
-        if hasattr(settings, 'elastic_api_key') and settings.elastic_api_key:
-            try:
+        # The Elasticsearch client (and the library itself) is only loaded on
+        # first use, keeping it off the cold-start path
+        if settings.elastic_api_key:
+            self.es_configured = True
+            self.index_name = "klein-ai-docs"
+        elif settings.elastic_cloud_id and settings.elastic_user and settings.elastic_pass:
+            self.es_configured = True
+        else:
+            self.es_configured = False
+            logger.info("Elasticsearch credentials not provided, using local fallback")
+
+    @property
+    def es_client(self) -> Optional[Any]:
+        """Elasticsearch client, created on first access (None when unavailable)"""
+        if not self._es_loaded:
+            with self._lock:
+                if not self._es_loaded:
+                    self._es_client = self._connect() if self.es_configured else None
+                    if self._es_client is not None:
+                        self._template_stored = self._store_template(self._es_client)
+                    self._es_loaded = True
+        return self._es_client
+
+    def _connect(self) -> Optional[Any]:
+        try:
+            from elasticsearch import Elasticsearch
+
+            if settings.elastic_api_key:
                 # Use API key authentication for Elastic Cloud Serverless
-                self.es_client = Elasticsearch(
+                client = Elasticsearch(
                     settings.elastic_endpoint,
                     api_key=settings.elastic_api_key
                 )
-                # Test connection and use real index from test
-                self.index_name = "klein-ai-docs"
                 logger.info("✅ Elasticsearch connected successfully! Using real search.")
-            except Exception as e:
-                logger.warning(f"Failed to initialize Elasticsearch: {e}")
-                self.es_client = None
-        elif settings.elastic_cloud_id and settings.elastic_user and settings.elastic_pass:
-            try:
+            else:
                 # Fallback to Cloud ID authentication
-                self.es_client = Elasticsearch(
+                client = Elasticsearch(
                     cloud_id=settings.elastic_cloud_id,
                     basic_auth=(settings.elastic_user, settings.elastic_pass)
                 )
                 logger.info("✅ Elasticsearch connected via Cloud ID!")
-            except Exception as e:
-                logger.warning(f"Failed to initialize Elasticsearch: {e}")
-                self.es_client = None
-        else:
-            logger.info("Elasticsearch credentials not provided, using local fallback")
+            return client
+        except Exception as e:
+            logger.warning(f"Failed to initialize Elasticsearch: {e}")
+            return None
 
-    def search_context(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
+    def _store_template(self, client: Any) -> bool:
+        """Store the search template; on failure searches send it inline instead"""
+        try:
+            client.put_script(id=SEARCH_TEMPLATE_ID, script={"lang": "mustache", "source": SEARCH_TEMPLATE})
+            return True
+        except Exception as e:
+            logger.warning(f"Could not store search template {SEARCH_TEMPLATE_ID}, sending it inline: {e}")
+            return False
+
+    def search_context(self, query: QueryContext, max_results: int = 3) -> List[Passage]:
         """
         Search for relevant context documents.
         Falls back to local documents if Elastic is not available.
         """
+        es_client = self.es_client
+        backend = "elastic" if es_client else "local"
+        with RETRIEVAL_SECONDS.time(backend=backend), tracer.span("retrieval", backend=backend) as span:
+            if es_client:
+                results = self._elastic_search(query, max_results)
+            else:
+                results = self._local_search(query, max_results)
+            span.set("hits", len(results))
+            return results
+
+    def search_many(self, queries: List[QueryContext], max_results: int = 3) -> List[List[Passage]]:
+        """
+        Search context for a batch of queries.
+        Duplicate queries (same QueryContext.key) are searched once and Elastic
+        gets a single msearch round trip.
+        """
+        unique = list({query.key: query for query in queries}.values())
+
         if self.es_client:
-            return self._elastic_search(query, max_results)
+            by_key = {}
+            misses = []
+            for query in unique:
+                cached = self.cache.get(self._cache_key(query, max_results))
+                if cached is None:
+                    misses.append(query)
+                else:
+                    by_key[query.key] = cached
+            if misses:
+                by_key.update(zip((query.key for query in misses), self._elastic_msearch(misses, max_results)))
         else:
-            return self._local_search(query, max_results)
+            by_key = {query.key: self._local_search(query, max_results) for query in unique}
 
-    def _elastic_search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
-        """Search using Elasticsearch hybrid search"""
-        try:
-            search_body = {
-                "query": {
-                    "multi_match": {
-                        "query": query,
-                        "fields": ["title^2", "content", "source"],
-                        "type": "best_fields"
-                    }
-                },
-                "size": max_results,
-                "_source": ["title", "content", "source"]
-            }
-
-            response = self.es_client.search(
-                index=self.index_name,
-                body=search_body
-            )
+        return [by_key[query.key] for query in queries]
 
-            results = []
-            for hit in response['hits']['hits']:
-                results.append({
-                    "title": hit['_source'].get('title', ''),
-                    "content": hit['_source'].get('content', ''),
-                    "source": hit['_source'].get('source', ''),
-                    "score": hit['_score']
-                })
+    def _cache_key(self, query: QueryContext, max_results: int) -> str:
+        return f"{self.index_name}\x1f{max_results}\x1f{query.key}"
+
+    def _template(self, query: QueryContext, max_results: int) -> Dict[str, Any]:
+        """Search template reference (stored id, or the source inline) and its params"""
+        template: Dict[str, Any] = {"id": SEARCH_TEMPLATE_ID} if self._template_stored else {"source": SEARCH_TEMPLATE}
+        template["params"] = {
+            "query": query.text,
+            "size": max_results,
+            "fragment_size": settings.elastic_fragment_chars,
+            "fragments": settings.elastic_fragments
+        }
+        return template
+
+    def _parse_hits(self, response: Dict[str, Any]) -> List[Passage]:
+        # filter_path drops "hits" entirely when nothing matched
+        passages = []
+        for hit in response.get('hits', {}).get('hits', ()):
+            source = hit.get('_source', {})
+            fragments = hit.get('highlight', {}).get('content', ())
+            passages.append(Passage(
+                source.get('title', ''),
+                FRAGMENT_SEPARATOR.join(fragments),
+                source.get('source', ''),
+                hit.get('_score') or 0.0
+            ))
+        return passages
 
+    def _elastic_search(self, query: QueryContext, max_results: int) -> List[Passage]:
+        """Search using Elasticsearch hybrid search"""
+        key = self._cache_key(query, max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            with tracer.span("elastic.search", index=self.index_name) as span:
+                response = self.es_client.search_template(
+                    index=self.index_name,
+                    filter_path=SEARCH_FILTER_PATH,
+                    **self._template(query, max_results)
+                )
+                results = self._parse_hits(response.body)
+                span.set("hits", len(results))
+            self.cache.put(key, results)
             return results
 
         except Exception as e:
@@ -103,26 +272,36 @@ class RetrievalService:
             # Fallback to local search
             return self._local_search(query, max_results)
 
-    def _local_search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
-        """Simple local search through predefined documents"""
-        query_lower = query.lower()
-        scored_docs = []
-
-        for doc in LOCAL_DOCS:
-            score = 0
-            # Simple scoring based on keyword matches
-            for word in query_lower.split():
-                if word in doc['title'].lower():
-                    score += 2
-                if word in doc['content'].lower():
-                    score += 1
-
-            if score > 0:
-                scored_docs.append({**doc, "score": score})
-
-        # Sort by score and return top results
-        scored_docs.sort(key=lambda x: x['score'], reverse=True)
-        return scored_docs[:max_results]
+    def _elastic_msearch(self, queries: List[QueryContext], max_results: int) -> List[List[Passage]]:
+        """Search several queries in one Elasticsearch msearch request"""
+        try:
+            searches = []
+            for query in queries:
+                searches.append({"index": self.index_name})
+                searches.append(self._template(query, max_results))
+
+            with tracer.span("elastic.msearch", index=self.index_name, queries=len(queries)):
+                response = self.es_client.msearch_template(search_templates=searches, filter_path=MSEARCH_FILTER_PATH)
+
+            results = []
+            for query, item in zip(queries, response['responses']):
+                if 'error' in item:
+                    logger.error(f"Elasticsearch msearch item failed: {item['error']}")
+                    results.append(self._local_search(query, max_results))
+                else:
+                    hits = self._parse_hits(item)
+                    self.cache.put(self._cache_key(query, max_results), hits)
+                    results.append(hits)
+            return results
+
+        except Exception as e:
+            logger.error(f"Elasticsearch msearch failed: {e}")
+            # Fallback to local search
+            return [self._local_search(query, max_results) for query in queries]
+
+    def _local_search(self, query: QueryContext, max_results: int) -> List[Passage]:
+        """Keyword search through the local knowledge base with the query language's analyzer"""
+        return self.local_docs.current.search(query, max_results)
 
     def index_document(self, doc: Dict[str, Any]) -> bool:
         """Index a new document (only works with Elastic)"""
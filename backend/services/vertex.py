@@ -0,0 +1,397 @@
+from core.config import settings
+from core.hedging import Hedger, HedgeBudget, BackgroundLoop
+from core.metrics import metrics_registry
+from typing import Any, Dict, Optional
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHE_EVENTS = metrics_registry.counter(
+    "klein_vertex_prompt_cache_total", "Context-cache handle events for the shared system prompts", ["event"]
+)
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+SAFETY_SETTINGS = [
+    {"category": category, "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
+    for category in (
+        "HARM_CATEGORY_HARASSMENT",
+        "HARM_CATEGORY_HATE_SPEECH",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "HARM_CATEGORY_DANGEROUS_CONTENT",
+    )
+]
+
+# Markers of a 400 that is about the handle itself (expired or deleted), not the request
+_MISSING_HANDLE = ("not found", "expired", "does not exist", "missing")
+
+def _stale_handle(response) -> bool:
+    """Whether a generation request failed because its cachedContent handle is gone"""
+    if response.status_code == 404:
+        return True
+    if response.status_code != 400:
+        return False
+    body = response.text.lower()
+    return "cachedcontent" in body.replace(" ", "") and any(marker in body for marker in _MISSING_HANDLE)
+
+class _CachedPrompt:
+    __slots__ = ("name", "expires_at", "retry_at", "rejected")
+
+    def __init__(self):
+        self.name: Optional[str] = None
+        self.expires_at = 0.0
+        self.retry_at = 0.0
+        self.rejected = False
+
+class PromptCache:
+    """
+    Registers each shared system prompt with Vertex context caching
+    (cachedContents) and hands out its resource name, so generation requests
+    carry a handle instead of the prompt text. Handles are renewed once less
+    than a fifth of their TTL is left.
+
+    handle() never waits on Vertex: registration and renewal run on a
+    background thread, and callers get None, sending the prompt inline,
+    until a handle exists. A prompt Vertex refuses to cache (400, e.g. below
+    the minimum cacheable size) is never registered again; other failures
+    are retried after RETRY_AFTER_S. Prompts are keyed by their text, so pass
+    the same prebuilt strings every time.
+    """
+    RETRY_AFTER_S = 300.0
+
+    def __init__(self, client: "VertexClient", ttl_s: int):
+        self.client = client
+        self.ttl_s = ttl_s
+        self._entries: Dict[str, _CachedPrompt] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0
+
+    def _fresh(self, entry: Optional[_CachedPrompt], now: float) -> bool:
+        return entry is not None and entry.name is not None and entry.expires_at - now > self.ttl_s / 5
+
+    def _due(self, entry: Optional[_CachedPrompt], now: float) -> bool:
+        if entry is None:
+            return True
+        return not entry.rejected and not self._fresh(entry, now) and entry.retry_at <= now
+
+    def handle(self, system_prompt: str) -> Optional[str]:
+        """cachedContents resource name for the prompt, or None to send it inline"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        entry = self._entries.get(system_prompt)
+        if self._fresh(entry, now):
+            return entry.name
+        if self._due(entry, now) and self._lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._refresh_in_background, args=(system_prompt,), name="vertex-prompt-cache", daemon=True
+            ).start()
+
+        # Keep using a handle that is being renewed while it lasts
+        if entry is not None and entry.name is not None and entry.expires_at > now + 1:
+            return entry.name
+        return None
+
+    def _refresh_in_background(self, system_prompt: str):
+        try:
+            self._refresh(system_prompt)
+        finally:
+            self._lock.release()
+
+    def register(self, system_prompt: str) -> Optional[str]:
+        """Register or renew a prompt now, blocking the caller (warm-up)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._refresh(system_prompt)
+
+    def _refresh(self, system_prompt: str) -> Optional[str]:
+        now = time.time()
+        entry = self._entries.setdefault(system_prompt, _CachedPrompt())
+        if not self._due(entry, now):
+            return entry.name if self._fresh(entry, now) else None
+
+        creating = False
+        try:
+            renewable = entry.name is not None and entry.expires_at > now + 1
+            if renewable and self.client.renew_cached_content(entry.name, self.ttl_s):
+                event = "renewed"
+            else:
+                creating = True
+                entry.name = self.client.create_cached_content(system_prompt, self.ttl_s)
+                event = "created"
+            entry.expires_at = now + self.ttl_s
+            entry.retry_at = 0.0
+            PROMPT_CACHE_EVENTS.inc(event=event)
+            return entry.name
+        except Exception as e:
+            # A failed renewal keeps the handle until it expires
+            if creating:
+                entry.name = None
+            if creating and getattr(getattr(e, "response", None), "status_code", None) == 400:
+                # Deterministic for this prompt text; asking again cannot succeed
+                entry.rejected = True
+                logger.info(f"Vertex declined to cache a system prompt, sending it inline: {e}")
+                PROMPT_CACHE_EVENTS.inc(event="rejected")
+                return None
+            if entry.retry_at == 0.0:
+                logger.warning(f"Vertex context caching unavailable, sending the system prompt inline: {e}")
+            else:
+                logger.debug("Vertex context caching still unavailable: %s", e)
+            PROMPT_CACHE_EVENTS.inc(event="failed")
+            entry.retry_at = now + self.RETRY_AFTER_S
+            return None
+
+    def invalidate(self, name: str):
+        """Forget a handle Vertex no longer accepts; the prompt is registered again in the background"""
+        for entry in self._entries.values():
+            if entry.name == name:
+                entry.name = None
+                entry.retry_at = 0.0
+                PROMPT_CACHE_EVENTS.inc(event="invalidated")
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "prompts": len(self._entries),
+            "cached": sum(1 for entry in self._entries.values() if entry.name and entry.expires_at > now),
+            "rejected": sum(1 for entry in self._entries.values() if entry.rejected)
+        }
+
+class VertexClient:
+    """
+    Vertex AI (Gemini) access for Klein.
+    google-auth and httpx are imported on first use, not at module import.
+    Raced generations use an async client on a background loop so losing
+    and timed-out requests are cancelled, not left running. System prompts
+    go through the context cache when Vertex accepts them (PromptCache).
+    """
+
+    def __init__(self):
+        self.project = settings.gcp_project
+        self.location = settings.gcp_location
+        self.model = settings.vertex_model
+        self.static_token = settings.vertex_access_token
+        self._credentials = None
+        self._http = None
+        self._async_http = None
+        self._lock = threading.Lock()
+
+        self.hedger = Hedger(
+            "vertex",
+            deadline_s=settings.vertex_deadline_s,
+            percentile=settings.vertex_hedge_percentile,
+            min_delay_s=settings.vertex_hedge_min_delay_s,
+            budget=HedgeBudget(settings.vertex_hedge_budget)
+        )
+        self._loop = BackgroundLoop("klein-vertex")
+        self.prompt_cache = PromptCache(self, settings.vertex_prompt_cache_ttl_s)
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.project)
+
+    @property
+    def live(self) -> bool:
+        """Whether Klein makes real (billed) generateContent calls; see VERTEX_GENERATE"""
+        return self.configured and settings.vertex_generate
+
+    @property
+    def base_url(self) -> str:
+        if settings.vertex_api_base:
+            return settings.vertex_api_base.rstrip("/")
+        return f"https://{self.location}-aiplatform.googleapis.com"
+
+    @property
+    def location_path(self) -> str:
+        return f"projects/{self.project}/locations/{self.location}"
+
+    def model_url(self, method: str = "generateContent") -> str:
+        return f"{self.base_url}/v1/{self.location_path}/publishers/google/models/{self.model}:{method}"
+
+    def _load_credentials(self):
+        """Service account file, inline key (GOOGLE_SERVICE_ACCOUNT_KEY), or default credentials"""
+        from google.oauth2 import service_account
+
+        if os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+            return service_account.Credentials.from_service_account_file(
+                os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
+                scopes=SCOPES
+            )
+
+        service_account_key = os.getenv("GOOGLE_SERVICE_ACCOUNT_KEY")
+        if service_account_key:
+            return service_account.Credentials.from_service_account_info(
+                json.loads(service_account_key),
+                scopes=SCOPES
+            )
+
+        # Default credentials (Cloud Run, gcloud auth, etc.)
+        from google.auth import default
+        credentials, _ = default(scopes=SCOPES)
+        return credentials
+
+    def access_token(self) -> str:
+        """OAuth access token, refreshed only when missing or about to expire"""
+        if self.static_token:
+            return self.static_token
+
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._load_credentials()
+
+            # valid is False when the token is missing or inside the refresh window
+            credentials = self._credentials
+            if not credentials.valid:
+                from google.auth.transport.requests import Request
+                credentials.refresh(Request())
+
+            return credentials.token
+
+    def http(self):
+        """Shared httpx client, so generation calls reuse connections"""
+        if self._http is None:
+            with self._lock:
+                if self._http is None:
+                    import httpx
+                    self._http = httpx.Client(timeout=30.0)
+        return self._http
+
+    def async_http(self):
+        """Shared httpx.AsyncClient; only used on the background loop"""
+        if self._async_http is None:
+            import httpx
+            self._async_http = httpx.AsyncClient(timeout=30.0)
+        return self._async_http
+
+    def create_cached_content(self, system_prompt: str, ttl_s: int) -> str:
+        """Register a system prompt with context caching; returns the cachedContents resource name"""
+        response = self.http().post(
+            f"{self.base_url}/v1/{self.location_path}/cachedContents",
+            headers=self._headers(),
+            json={
+                "model": f"{self.location_path}/publishers/google/models/{self.model}",
+                "systemInstruction": {"parts": [{"text": system_prompt}]},
+                "ttl": f"{ttl_s}s"
+            },
+            timeout=5.0
+        )
+        response.raise_for_status()
+        return response.json()["name"]
+
+    def renew_cached_content(self, name: str, ttl_s: int) -> bool:
+        """Push a cached content's expiry out to ttl_s from now; False if it no longer exists"""
+        response = self.http().patch(
+            f"{self.base_url}/v1/{name}",
+            params={"updateMask": "ttl"},
+            headers=self._headers(),
+            json={"ttl": f"{ttl_s}s"},
+            timeout=5.0
+        )
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def _payload(self, system_prompt: str, user_prompt: str, max_output_tokens: int,
+                 cached_content: Optional[str] = None) -> Dict[str, Any]:
+        payload = {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [
+                        {"text": user_prompt}
+                    ]
+                }
+            ],
+            "generationConfig": {
+                "temperature": 0.7,
+                "topK": 40,
+                "topP": 0.95,
+                "maxOutputTokens": max_output_tokens
+            },
+            "safetySettings": SAFETY_SETTINGS
+        }
+        if cached_content:
+            payload["cachedContent"] = cached_content
+        else:
+            payload["systemInstruction"] = {"parts": [{"text": system_prompt}]}
+        return payload
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.access_token()}",
+            "Content-Type": "application/json"
+        }
+
+    def _extract_text(self, result: Dict[str, Any]) -> str:
+        for candidate in result.get("candidates", [])[:1]:
+            parts = candidate.get("content", {}).get("parts", [])
+            if parts and "text" in parts[0]:
+                return parts[0]["text"]
+
+        raise ValueError("No valid response from Gemini")
+
+    def generate(self, system_prompt: str, user_prompt: str, max_output_tokens: int = 1024) -> str:
+        """Single Gemini generateContent call; raises on any failure"""
+        url = self.model_url()
+        headers = self._headers()
+        handle = self.prompt_cache.handle(system_prompt)
+        response = self.http().post(
+            url, headers=headers, json=self._payload(system_prompt, user_prompt, max_output_tokens, handle)
+        )
+        if handle and _stale_handle(response):
+            self.prompt_cache.invalidate(handle)
+            response = self.http().post(
+                url, headers=headers, json=self._payload(system_prompt, user_prompt, max_output_tokens)
+            )
+        response.raise_for_status()
+        return self._extract_text(response.json())
+
+    def generate_raced(self, system_prompt: str, user_prompt: str, max_output_tokens: int = 1024,
+                       hedge: bool = True) -> str:
+        """
+        generate() raced against VERTEX_DEADLINE_S, with a hedged second
+        request once the call is slower than recent tail latency
+
+        Raises:
+            DeadlineExceeded: No answer before the deadline (every request is cancelled)
+        """
+        if not self.hedger.active:
+            return self.generate(system_prompt, user_prompt, max_output_tokens)
+
+        # Token refresh can block, so it happens here rather than on the loop
+        url = self.model_url()
+        headers = self._headers()
+        handle = self.prompt_cache.handle(system_prompt)
+        payload = self._payload(system_prompt, user_prompt, max_output_tokens, handle)
+
+        async def attempt() -> str:
+            response = await self.async_http().post(url, headers=headers, json=payload)
+            if handle and _stale_handle(response):
+                self.prompt_cache.invalidate(handle)
+                response = await self.async_http().post(
+                    url, headers=headers, json=self._payload(system_prompt, user_prompt, max_output_tokens)
+                )
+            response.raise_for_status()
+            return self._extract_text(response.json())
+
+        return self._loop.run(self.hedger.run(attempt, hedge=hedge))
+
+    def warm_up(self):
+        """Load google-auth and httpx and fetch a token ahead of the first request"""
+        if self.live:
+            self.access_token()
+            self.http()
+
+# Global instance
+vertex_client = VertexClient()
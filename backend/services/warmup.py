@@ -0,0 +1,54 @@
+from models.schemas import ChatResponse
+from services.retrieval import retrieval_service
+from services.vertex import vertex_client
+from services.klein import klein_service
+from services.ophir import ophir_service
+from services.pipeline import chat_pipeline
+from services.query import QueryContext
+from typing import Callable, Dict
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "warm up"
+
+def _exercise_pipeline():
+    """Run the pure-Python stages once without touching Vertex or the audit log"""
+    query = QueryContext(WARMUP_QUERY)
+    docs = retrieval_service._local_search(query, 3)
+    context = klein_service._format_context(docs, "normal")
+    answer = klein_service._stub_response(query, context.text, "normal")
+    status, answer = ophir_service.evaluate_response(query, answer)
+    chat_pipeline.fallback_router.route(query.folded)
+    ChatResponse(answer=answer, status=status).model_dump_json()
+
+def _register_prompts():
+    """Register the system prompts now rather than on the first generation"""
+    if vertex_client.live:
+        for prompt in klein_service.system_prompts.values():
+            vertex_client.prompt_cache.register(prompt)
+
+def warm_up() -> Dict[str, float]:
+    """
+    Load the lazily imported clients and warm the request path.
+    Returns per-step durations in milliseconds.
+    """
+    steps: Dict[str, Callable[[], object]] = {
+        "elastic_client": lambda: retrieval_service.es_client,
+        "vertex_client": vertex_client.warm_up,
+        "vertex_prompt_cache": _register_prompts,
+        "pipeline": _exercise_pipeline,
+    }
+
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+        timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+    logger.info(f"Warm-up finished: {timings}")
+    return timings
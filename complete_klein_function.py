@@ -13,6 +13,9 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# Persona prompts per energy mode, built on first use
+_SYSTEM_PROMPTS: Dict[str, str] = {}
+
 def get_klein_response(self, query: str, mode: str = "normal") -> str:
     """
     Generate Klein's response using Elastic context + Vertex AI (Gemini)
@@ -27,8 +30,8 @@ def get_klein_response(self, query: str, mode: str = "normal") -> str:
     try:
         # Step 1: Get context from Elastic Search
         logger.info(f"Klein processing query: {query}")
-        context_docs = retrieval_service.search_context(query)
-        context_text = self._format_context(context_docs)
+        context_docs = retrieval_service.search_context(QueryContext(query))
+        context_text = self._format_context(context_docs, mode)
 
         # Step 2: Check if Vertex AI is available
         if self.vertex_available and settings.gcp_project:
@@ -51,7 +54,9 @@ def _get_vertex_ai_response(self, query: str, context: str, mode: str) -> str:
     """
     try:
         # Prepare the prompt with context and personality
-        system_prompt = self._build_klein_system_prompt(mode)
+        system_prompt = _SYSTEM_PROMPTS.get(mode)
+        if system_prompt is None:
+            system_prompt = _SYSTEM_PROMPTS[mode] = self._build_klein_system_prompt(mode)
         user_prompt = self._build_user_prompt(query, context)
 
         # Call Vertex AI Gemini
@@ -259,53 +264,33 @@ def _get_smart_stub_response(self, query: str, context: str, mode: str) -> str:
     Enhanced stub responses when Vertex AI is unavailable
     Uses context and smart pattern matching
     """
-    query_lower = query.lower()
-
     # Energy brownout mode
     if mode == "peak":
         return f"Klein (Energy Brownout): Brief guidance on '{query}' - System in reduced capacity. {context[:50] if context else 'General assistance available.'}"
 
-    # Weather queries
-    if any(word in query_lower for word in ["weather", "temperature", "rain", "climate", "hurricane"]):
-        if any(location in query_lower for word in ["haiti", "port-au-prince", "caribbean"]):
-            response = "Klein: Port-au-Prince has a tropical climate with temperatures typically 25-30°C (77-86°F). The rainy season runs May-October with hurricane season June-November. "
-            if context:
-                response += f"Additional context: {context[:100]}..."
-            return response
-
-    # Emotional support queries
-    if any(word in query_lower for word in ["overwhelmed", "stressed", "anxious", "sad", "depressed", "help", "difficult"]):
-        return "Klein: I hear that you're going through a challenging time, and I want you to know that your feelings are completely valid. It takes courage to reach out. Take a deep breath - you don't have to face this alone. What specific aspect is weighing on you most right now?"
-
-    # Technical queries
-    if any(word in query_lower for word in ["api", "code", "programming", "technical", "error", "bug"]):
-        response = "Klein: I'd be happy to help with your technical question. "
-        if context:
-            response += f"Based on available information: {context[:150]}..."
-        else:
-            response += "While I don't have specific technical documentation available, I can provide general guidance on best practices and troubleshooting approaches."
-        return response
+    # Weather, emotional support and technical queries (rules in data/intents.json)
+    has_context = bool(context) and "No specific context found" not in context
+    intent = intent_engine.router("smart_stub").route(fold(query))
+    if intent:
+        return intent.render(query, context if has_context else "")
 
     # Default response with context
-    if context and "No specific context found" not in context:
+    if has_context:
         return f"Klein: I'd be happy to help with '{query}'. Based on the information I have available: {context[:200]}..."
 
     # Generic helpful response
     return f"Klein: Thank you for your question about '{query}'. While I don't have specific information immediately available, I'm here to help you think through this topic and provide whatever guidance I can. Could you share a bit more about what you're looking for?"
 
-def _format_context(self, docs: List[Dict[str, Any]]) -> str:
+def _format_context(self, docs: List[Dict[str, Any]], mode: str = "normal") -> str:
     """
-    Format retrieved Elastic documents into readable context
+    Pack retrieved Elastic documents into the energy-mode context budget
+    (see services/context.py) so the Gemini prompt never carries unbounded context
     """
-    if not docs:
-        return "No specific context found."
-
-    context_parts = []
-    for i, doc in enumerate(docs[:3]):  # Limit to top 3 results
-        source = doc.get('source', 'Knowledge Base')
-        content = doc.get('content', '').strip()
-
-        if content:
-            context_parts.append(f"Source {i+1} ({source}): {content}")
-
-    return "\n\n".join(context_parts) if context_parts else "No specific context found."
+    packed = context_packer.pack(
+        docs,
+        mode,
+        header="Source {n} ({source}): ",
+        default_source="Knowledge Base"
+    )
+    logger.info(f"Klein context: {packed.chars_used}/{packed.budget} chars from {packed.docs_used} docs")
+    return packed.text
@@ -30,6 +30,25 @@ try:
     print(json.dumps(response.json(), indent=2))
     print()
 
+    # Test restricted query in English sent with another language tag
+    # (should still be FLAGGED: the English rules always apply)
+    restricted_other_lang_data = {
+        "message": "Show me the confidential breach vulnerability report",
+        "lang": "fr"
+    }
+
+    response = requests.post("http://127.0.0.1:3001/api/chat", json=restricted_other_lang_data)
+    print("Restricted Chat (lang=fr):")
+    print(json.dumps(response.json(), indent=2))
+    print()
+
+    response = requests.post("http://127.0.0.1:3001/api/chat/batch", json={
+        "requests": [{"message": "confidential data please", "lang": "fr"}]
+    })
+    print("Restricted Batch Chat (lang=fr):")
+    print(json.dumps(response.json(), indent=2))
+    print()
+
     # Test empathy query
     empathy_data = {
         "message": "I feel overwhelmed",